@@ -0,0 +1,476 @@
+import io
+import os
+import re
+import sys
+import json
+import time
+import pickle
+import argparse
+import contextlib
+import statistics
+import subprocess
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from pcb012_core import (
+    lazy_module, xlsb_file, profile_dataframe, build_search_indexes, 
+    compile_filter, build_report, top_n, diff_snapshots, scale_snapshot, 
+    start_compute_pool, run_compute, ingest_task, rank_index, rank_top, 
+    customer_dimension, add_ageing, report_date, stat_pm, 
+    DEFAULT_RATES, INFO_COLUMNS, TABS, COMPUTE_WORKERS,
+)
+
+# charts are rendered off-screen, as the web-app does through st.pyplot
+os.environ.setdefault("MPLBACKEND", "Agg")
+plt = lazy_module("matplotlib.pyplot")
+
+
+
+# =============================================================================
+#
+# Start-up
+#
+# =============================================================================
+
+# modules whose cold import is measured; each runs in a fresh interpreter so
+# nothing is shared through sys.modules
+STARTUP_MODULES = ["pcb012_core", "pcb012", "Monitoring"]
+
+
+# function to time one cold import of a module in a fresh interpreter
+def cold_import(module : str) -> dict:
+    code = ("import sys, time\n"
+            "t = time.perf_counter()\n"
+            f"import {module}\n"
+            "t = time.perf_counter() - t\n"
+            "print(t, 'matplotlib' in sys.modules, 'streamlit' in sys.modules)")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True,
+                         text=True, check=True).stdout.split()
+    return {"seconds": float(out[0]),
+            "matplotlib": out[1] == "True",
+            "streamlit": out[2] == "True"}
+
+
+# function to report the median cold-import time of every start-up module
+def bench_startup(repeat : int = 5) -> dict:
+    report = {}
+    for module in STARTUP_MODULES:
+        runs = [cold_import(module) for _ in range(repeat)]
+        report[module] = {"median_s": statistics.median(r["seconds"] for r in runs),
+                          "imports_matplotlib": runs[0]["matplotlib"],
+                          "imports_streamlit": runs[0]["streamlit"]}
+        print('{:12} {:8.3f}s  matplotlib={} streamlit={}'.format(
+              module, report[module]["median_s"],
+              report[module]["imports_matplotlib"],
+              report[module]["imports_streamlit"]))
+    return report
+
+
+
+# =============================================================================
+#
+# Timing helpers
+#
+# =============================================================================
+
+# function to run func(*args) `repeat` times, return the median time and the 
+# last result; prints of the core (statistic) are swallowed
+def timed(repeat : int, func, *args):
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            t = time.perf_counter()
+            result = func(*args)
+            times.append(time.perf_counter() - t)
+    return statistics.median(times), result
+
+
+# function to make an xlsb_file around a cleaned dataframe without running 
+# its constructor, so that each stage can be timed on its own
+def xlsb_shell(df : pd.DataFrame) -> xlsb_file:
+    obj = xlsb_file.__new__(xlsb_file)
+    obj.data = df
+    obj.dict_mp = {}
+    obj.stat = {}
+    return obj
+
+
+def run_df_2_dict(df):
+    obj = xlsb_shell(df)
+    obj.df_2_dict()
+    return obj.dict_mp
+
+
+def run_statistic(df):
+    obj = xlsb_shell(df)
+    obj.statistic()
+    return obj.stat
+
+
+# function to read a Report sheet through pyxlsb, the path read falls back to
+def read_pyxlsb(path):
+    return pd.read_excel(path, engine='pyxlsb', sheet_name='Report')
+
+
+
+# =============================================================================
+#
+# Stages
+#
+# =============================================================================
+
+# The conditions a user typically sets in the filters of a tab: a type, a 
+# range on a money column, a substring of the description and a WO prefix
+FILTER_CONDITIONS = [("Type", "isin", ["MP", "PR", "WO"]),
+                     ("Contract_budget", "between", (0, 1e12)),
+                     ("Description", "contains", "project"),
+                     ("WO", "contains", "-100")]
+
+
+# function to filter a dataset the way filter_dataframe does once the 
+# widgets are set: one compiled mask over the prebuilt search indexes
+def run_filter(df, search):
+    return df.loc[compile_filter(df, FILTER_CONDITIONS, search), TABS["cnc"]["columns"]]
+
+
+# function to select the top-N rows of every chart of every tab, on the
+# views of the tabs, with top_n or with the rank index
+def run_tops(df, ranks=None):
+    tops = {}
+    for tab, spec in TABS.items():
+        view = df.loc[df["Type"] == spec["type"], spec["columns"]]
+        for name, top in spec["tops"].items():
+            tops[(tab, name)] = top_n(view, *top) if ranks is None else rank_top(ranks, df, view, *top)
+    return tops
+
+
+
+# function to build the customer dimension and its exposure view
+def run_customers(df):
+    return customer_dimension(df).view(df)
+
+
+
+# function to save a figure to PNG bytes, as st.pyplot does
+def figure_bytes(fig) -> int:
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    plt.close(fig)
+    return buffer.getbuffer().nbytes
+
+
+# function to render the charts of the information and Contract & Cost tabs
+def render_charts(df, report):
+    size = 0
+    
+    table = report["info_entity_stat"]
+    for measure in ["# WOs", "Contract budget", "Contract invoiced", "Outs. invoice"]:
+        values = table[measure].clip(lower=0)
+        if values.sum() > 0:
+            fig, ax = plt.subplots()
+            ax.pie(values, labels=table.index.tolist(), autopct='%1.1f%%', startangle=90)
+            ax.axis('equal')
+            size += figure_bytes(fig)
+        
+    data = df[df["Type"] == TABS["cnc"]["type"]]
+    df_plot = top_n(data, *TABS["cnc"]["tops"]["budget"])
+    if len(df_plot) > 0:
+        fig, ax = plt.subplots()
+        ax.pie(df_plot['Contract_budget'], labels=df_plot['WO'], autopct='%1.f%%', startangle=90)
+        ax.axis('equal')
+        size += figure_bytes(fig)
+    
+    for name in ["workload", "outstanding"]:
+        measure, *_ = TABS["cnc"]["tops"][name]
+        df_plot = top_n(data, *TABS["cnc"]["tops"][name])
+        fig, ax = plt.subplots()
+        ax.bar(df_plot['WO'].astype(str), df_plot[measure])
+        ax.grid(color='gray', linestyle='dashed')
+        plt.xticks(rotation=75)
+        size += figure_bytes(fig)
+        
+    return size
+
+
+# function to time the stages shared by a single file and a full week
+def bench_dataset(df : pd.DataFrame, repeat : int) -> dict:
+    result = {"rows": len(df)}
+    
+    result["df_2_dict"], _      = timed(repeat, run_df_2_dict, df)
+    result["statistic"], _      = timed(repeat, run_statistic, df)
+    result["profile"], _        = timed(repeat, profile_dataframe, df)
+    result["search_index"], search = timed(repeat, build_search_indexes, df)
+    result["filter"], _         = timed(repeat, run_filter, df, search)
+    result["top_n"], _          = timed(repeat, run_tops, df)
+    result["rank_index"], ranks = timed(repeat, rank_index, df)
+    result["rank_top"], _       = timed(repeat, run_tops, df, ranks)
+    result["customers"], _      = timed(repeat, run_customers, df)
+    result["aggregations"], report = timed(repeat, build_report, df)
+    result["charts"], _         = timed(repeat, render_charts, df, report)
+    
+    return result
+
+
+
+# =============================================================================
+#
+# Allocations of a rerun
+#
+# =============================================================================
+
+# function to measure the memory allocated by a call, as the peak of the
+# traced allocations in MB
+def allocated(func, *args) -> float:
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+# function to run the data work of the tabs in one rerun of the web-app: 
+# each tab selects its view of the dataset and summarises it
+def run_tabs(df, search, ranks):
+    views = {"info": df[INFO_COLUMNS]}
+    for tab, spec in TABS.items():
+        view = df.loc[compile_filter(df, [("Type", "isin", [spec["type"]])], search), spec["columns"]]
+        views[tab] = [stat_pm(view, spec["stat"])] + [rank_top(ranks, df, view, *top) for top in spec["tops"].values()]
+    return views
+
+
+# function to take the snapshots of a week from the cache and combine them,
+# as the Diff tab does on every rerun
+# `parts` is a list of (cached snapshot, rate); `fetch` gives the snapshot 
+# to the tab, shared as it is (st.cache_resource) or unpickled into a copy
+# (st.cache_data)
+def run_snapshots(parts, fetch):
+    return pd.concat([scale_snapshot(fetch(x), rate) for x, rate in parts], ignore_index=True)
+
+
+# function to measure the allocations (MB) of one rerun, part by part, 
+# against the data of `week` and of `previous`
+def rerun_allocations(df, previous, shared) -> dict:
+    search, ranks = build_search_indexes(df), rank_index(df)
+    cached = [[(pickle.dumps(x), rate) for x, rate in parts] for parts in shared]
+    
+    result = {"tabs": allocated(run_tabs, df, search, ranks), 
+              "snapshots": sum(allocated(run_snapshots, parts, lambda x: x) for parts in shared), 
+              "snapshots_copied": sum(allocated(run_snapshots, parts, pickle.loads) for parts in cached), 
+              "diff": allocated(diff_snapshots, previous, df)}
+    result["rerun"] = result["tabs"] + result["snapshots"] + result["diff"]
+    result["rerun_copied"] = result["tabs"] + result["snapshots_copied"] + result["diff"]
+    return result
+
+
+
+# =============================================================================
+#
+# Snapshots in data/
+#
+# =============================================================================
+
+FILE_PATTERN = re.compile(r"pcb012a_(\d{4})_([A-Z]{2})\.xlsb$")
+
+
+# function to list the snapshots of a folder as {week: {entity: path}}
+def list_snapshots(data_dir : str) -> dict:
+    weeks = {}
+    for name in sorted(os.listdir(data_dir)):
+        match = FILE_PATTERN.match(name)
+        if match:
+            weeks.setdefault(match.group(1), {})[match.group(2)] = os.path.join(data_dir, name)
+    return weeks
+
+
+# function to time the ingest and every stage of each single file
+# Returns the timings and the cleaned frames, reused for the weekly benchmark
+def bench_files(weeks : dict, repeat : int) -> tuple:
+    timings = {}
+    frames = {}
+    
+    for week, files in weeks.items():
+        for entity, path in files.items():
+            obj = xlsb_shell(pd.DataFrame())
+            result = {}
+            result["read"], raw = timed(repeat, obj.read, path)
+            result["read_pyxlsb"], _ = timed(repeat, read_pyxlsb, path)
+            result["clean"], df = timed(repeat, obj.clean, raw, entity, 1.0)
+            result["ageing"], df = timed(repeat, add_ageing, df, report_date(path))
+            result.update(bench_dataset(df, repeat))
+            
+            timings[os.path.basename(path)] = result
+            frames[(week, entity)] = df
+            print('{:24} {:6d} rows  read {:6.3f}s (pyxlsb {:6.3f}s)  clean {:6.3f}s  ageing {:6.3f}s  df_2_dict {:6.3f}s  aggregations {:6.3f}s'.format(
+                  os.path.basename(path), result["rows"], result["read"], result["read_pyxlsb"], result["clean"], result["ageing"], 
+                  result["df_2_dict"], result["aggregations"]))
+            
+    return timings, frames
+
+
+# function to time the stages on every week having all six entities, in EUR 
+# as the web-app shows them, plus the diff against the previous full week
+# and a rerun of the web-app, whose allocations are measured as well
+# Returns the timings and the allocations (MB) per week
+def bench_weeks(weeks : dict, frames : dict, repeat : int) -> tuple:
+    timings = {}
+    allocations = {}
+    previous = None
+    previous_week = None
+    
+    for week, files in weeks.items():
+        if not set(DEFAULT_RATES) <= set(files):
+            continue
+        
+        def combine():
+            parts = [scale_snapshot(frames[(week, e)], DEFAULT_RATES[e] / DEFAULT_RATES["NL"]) 
+                     for e in DEFAULT_RATES]
+            return pd.concat(parts, ignore_index=True)
+        
+        result = {}
+        result["combine"], df = timed(repeat, combine)
+        result.update(bench_dataset(df, repeat))
+        if previous is not None:
+            result["diff"], _ = timed(repeat, diff_snapshots, previous, df)
+            
+            shared = [[(frames[(x, e)], DEFAULT_RATES[e] / DEFAULT_RATES["NL"]) for e in DEFAULT_RATES] 
+                      for x in (previous_week, week)]
+            allocations[week] = rerun_allocations(df, previous, shared)
+        previous = df
+        previous_week = week
+        
+        timings[week] = result
+        print('week {:6} {:6d} rows  aggregations {:6.3f}s  charts {:6.3f}s'.format(
+              week, result["rows"], result["aggregations"], result["charts"]), end='')
+        if week in allocations:
+            print('  rerun {:5.1f} MB (with copied snapshots {:5.1f} MB)'.format(
+                  allocations[week]["rerun"], allocations[week]["rerun_copied"]), end='')
+        print()
+        
+    return timings, allocations
+
+
+# function to time the ingest of all files as concurrent sessions do it: 
+# from 6 threads in this process, then from 6 threads through the workers
+# The workers are started and warmed up before the timing
+def bench_pool(weeks : dict, workers : int) -> dict:
+    jobs = [(path, entity, 1.0) for files in weeks.values() for entity, path in files.items()]
+    pool = start_compute_pool(workers)
+    
+    def ingest(job):
+        return run_compute(None, ingest_task, *job)
+    
+    def ingest_pool(job):
+        return run_compute(pool, ingest_task, *job)
+    
+    def run(func):
+        with ThreadPoolExecutor(max_workers=6) as threads:
+            return list(threads.map(func, jobs))
+    
+    with contextlib.redirect_stdout(io.StringIO()):
+        run(ingest_pool)
+        t = time.perf_counter()
+        run(ingest)
+        threads = time.perf_counter() - t
+        t = time.perf_counter()
+        run(ingest_pool)
+        processes = time.perf_counter() - t
+    pool.shutdown()
+    
+    print('ingest of {} files: {:.3f}s in threads, {:.3f}s on {} workers'.format(
+          len(jobs), threads, processes, workers))
+    return {"files": len(jobs), "workers": workers, "threads_s": threads, "workers_s": processes}
+
+
+
+# function to sum up each stage over the files or the weeks
+def summarize(timings : dict) -> dict:
+    stages = {}
+    for result in timings.values():
+        for stage, value in result.items():
+            if stage != "rows":
+                stages.setdefault(stage, []).append(value)
+    return {stage: {"median_s": statistics.median(values), "max_s": max(values), "total_s": sum(values)} 
+            for stage, values in stages.items()}
+
+
+# function to print the change of each stage against an earlier report
+def compare(report : dict, baseline : dict):
+    print('\n{:8} {:14} {:>10} {:>10} {:>8}'.format("Scope", "Stage", "Before", "Now", "Ratio"))
+    for scope in ["files", "weeks"]:
+        for stage, now in report.get("summary", {}).get(scope, {}).items():
+            before = baseline.get("summary", {}).get(scope, {}).get(stage)
+            if before and before["total_s"] > 0:
+                print('{:8} {:14} {:9.3f}s {:9.3f}s {:7.2f}x'.format(
+                      scope, stage, before["total_s"], now["total_s"], now["total_s"] / before["total_s"]))
+                
+    for week, now in report.get("allocations", {}).items():
+        before = baseline.get("allocations", {}).get(week, {})
+        for stage, value in now.items():
+            if before.get(stage):
+                print('{:8} {:14} {:8.1f}MB {:8.1f}MB {:7.2f}x'.format(
+                      week, stage, before[stage], value, value / before[stage]))
+
+
+
+# =============================================================================
+#
+# Main
+#
+# =============================================================================
+
+# function to parse the command line
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the 012 web-app and its core")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per measurement, the median is reported")
+    parser.add_argument("--data-dir", default="data",
+                        help="folder with the pcb012a_<week>_<entity>.xlsb snapshots")
+    parser.add_argument("--weeks", nargs="*", default=None,
+                        help="weeks to benchmark, e.g. 2451 2452 (default: all)")
+    parser.add_argument("--skip-startup", action="store_true",
+                        help="do not measure the cold imports")
+    parser.add_argument("--workers", type=int, default=COMPUTE_WORKERS,
+                        help="worker processes of the ingest through the pool (0: skip)")
+    parser.add_argument("--baseline", default=None,
+                        help="earlier report to compare with")
+    parser.add_argument("--out", default="benchmark.json",
+                        help="machine-readable report")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args   = parse_args(argv)
+    report = {"python": sys.version.split()[0],
+              "pandas": pd.__version__,
+              "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "repeat": args.repeat}
+    
+    if not args.skip_startup:
+        report["startup"] = bench_startup(args.repeat)
+    
+    weeks = list_snapshots(args.data_dir)
+    if args.weeks:
+        weeks = {week: files for week, files in weeks.items() if week in args.weeks}
+        
+    files, frames = bench_files(weeks, args.repeat)
+    report["files"] = files
+    report["weeks"], report["allocations"] = bench_weeks(weeks, frames, args.repeat)
+    if args.workers > 0:
+        report["pool"] = bench_pool(weeks, args.workers)
+    report["summary"] = {"files": summarize(report["files"]), 
+                         "weeks": summarize(report["weeks"])}
+    
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Report written to " + args.out)
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,1328 +1,1552 @@
-import socket
-import requests
-
-import streamlit as st
-
-import pandas as pd
-
-from pandas.api.types import (
-    is_categorical_dtype,
-    is_datetime64_any_dtype,
-    is_numeric_dtype,
-    is_object_dtype,
-)
-
-from datetime import datetime, timedelta
-
-import matplotlib.pyplot as plt
-
-
-
-# =============================================================================
-# 
-# General supporting functions
-# 
-# =============================================================================
-
-# function to convert Excel-time to normal time
-def excel_float_to_datetime(excel_float):
-    return (datetime(1899, 12, 30) + timedelta(days=excel_float)).date()
-
-
-
-# function to generate a filtering-enable dataframe
-def filter_dataframe(df : pd.DataFrame, checkbox_name : str) -> pd.DataFrame:
-    """
-    Reference: https://blog.streamlit.io/auto-generate-a-dataframe-filtering-ui-in-streamlit-with-filter_dataframe/
-    """
-    modify = st.checkbox(checkbox_name)
-
-    if not modify:
-        return df
-
-    df = df.copy()
-
-    # Try to convert datetimes into a standard format (datetime, no timezone)
-    for col in df.columns:
-        if is_object_dtype(df[col]):
-            try:
-                df[col] = pd.to_datetime(df[col])
-            except Exception:
-                pass
-
-        if is_datetime64_any_dtype(df[col]):
-            df[col] = df[col].dt.tz_localize(None)
-
-    modification_container = st.container()
-
-    with modification_container:
-        to_filter_columns = st.multiselect("Filter dataframe on", df.columns)
-        for column in to_filter_columns:
-            left, right = st.columns((1, 20))
-            
-            if is_categorical_dtype(df[column]) or df[column].nunique() < 30:
-                user_cat_input = right.multiselect(
-                    f"Values for {column}",
-                    df[column].unique(),
-                    default=list(df[column].unique()),
-                )
-                df = df[df[column].isin(user_cat_input)]
-                
-            elif is_numeric_dtype(df[column]):
-                _min = float(df[column].min())
-                _max = float(df[column].max())
-                step = (_max - _min) / 100
-                user_num_input = right.slider(
-                    f"Values for {column}",
-                    min_value=_min,
-                    max_value=_max,
-                    value=(_min, _max),
-                    step=step,
-                )
-                df = df[df[column].between(*user_num_input)]
-                
-            elif is_datetime64_any_dtype(df[column]):
-                user_date_input = right.date_input(
-                    f"Values for {column}",
-                    value=(
-                        df[column].min(),
-                        df[column].max(),
-                    ),
-                )
-                if len(user_date_input) == 2:
-                    user_date_input = tuple(map(pd.to_datetime, user_date_input))
-                    start_date, end_date = user_date_input
-                    df = df.loc[df[column].between(start_date, end_date)]
-                    
-            else:
-                user_text_input = right.text_input(
-                    f"Substring or regex in {column}",
-                )
-                if user_text_input:
-                    df = df[df[column].astype(str).str.contains(user_text_input)]
-             
-    # # Format all float data
-    # float_columns = df.select_dtypes(include=['float64', 'float']).columns
-    # format_dict = {col: '{:.2f}' for col in float_columns}
-    # df = df.style.format(format_dict)
-    
-    return df
-
-
-
-# function to get file URLs from a GitHub repository
-def get_github_file_url(repo_owner, repo_name, branch, file_name):
-    api_url = f'https://api.github.com/repos/{repo_owner}/{repo_name}/git/trees/{branch}?recursive=1'
-    response = requests.get(api_url)
-    if response.status_code == 200:
-        tree = response.json().get('tree', [])
-        file_urls = [f'https://raw.githubusercontent.com/{repo_owner}/{repo_name}/{branch}/{file["path"]}' for file in tree if file['type'] == 'blob']
-        
-        # return file_urls
-        for url in file_urls:
-            if file_name in url:
-                return url
-            
-        st.write('Cannot find the url for ', file_name, '.')
-        return []
-        
-    else:
-        st.write('Failed to fetch ', file_name, ' from GitHub.')
-        return []
-
-
-
-# function to get file URLs from a GitHub repository
-def get_github_list_data_file(repo_owner, repo_name, branch):
-    api_url = f'https://api.github.com/repos/{repo_owner}/{repo_name}/git/trees/{branch}?recursive=1'
-    response = requests.get(api_url)
-    if response.status_code == 200:
-        tree = response.json().get('tree', [])
-        file_urls = [f'https://raw.githubusercontent.com/{repo_owner}/{repo_name}/{branch}/{file["path"]}' for file in tree if file['type'] == 'blob']
-        # print(file_urls)
-        
-        to_check = [str(i) for i in range(2401,2553)]
-        # print(to_check)
-        
-        available = []
-        for name in to_check:
-            for url in file_urls:
-                if name in url:
-                    available.append(name)
-                    break
-            
-        return available
-        
-    else:
-        st.write('Failed to fetch data from GitHub.')
-        return []
-
-
-
-# =============================================================================
-# repo_owner = 'chitn'
-# repo_name = 'trial'
-# branch = 'main'
-# file_name = 'pcb012a_2450_VN.xlsb'
-# 
-# file_url = get_github_file_url(repo_owner, repo_name, branch, file_name)
-# print(file_url)
-# =============================================================================
-      
-
-
-# function to check if Streamlit app is running locally or online, 
-# by using os and socket libraries to determine the environment
-# If the IP address of the machine running the app starts with 
-# 127. or 192.168., it is likely running locally. 
-# Otherwise, it is running online.
-def is_running_locally():
-    hostname = socket.gethostname()
-    local_ip = socket.gethostbyname(hostname)
-    print(hostname, ' ', local_ip)
-    return local_ip.startswith('127.') or local_ip.startswith('192.168.')
-
-
-# =============================================================================
-# 
-# Processing data from pcb012
-# 
-# =============================================================================
-
-class xlsb_file:
-    
-    def __init__(self, xlsb_file_name, entity, rate):        
-        self.data = pd.DataFrame()
-        self.dict_mp = {}        
-        self.stat = {}
-        
-        self.input(xlsb_file_name, entity, rate)
-        
-        self.df_2_dict()
-        self.statistic()
-        
-        # self.to_excel("pcb012_VN")
-        
-                      
-        
-    def input(self, file_name : str, entity : str, rate : float):
-        
-        # =====================================================================
-        # This function reads the xlsb file and does some cleaning works
-        # =====================================================================
-
-        """
-        if is_running_locally():
-            # Read xlsb file - locally
-            print('Running local.') 
-        else:
-            # Read xlsb file - github
-            repo_owner = 'chitn'
-            repo_name = 'trial'
-            branch = 'main'            
-            file_name = get_github_file_url(repo_owner, repo_name, branch, file_name)
-            print('Running online.') 
-        """
-        
-        repo_owner = 'chitn'
-        repo_name = 'trial'
-        branch = 'main'            
-        file_name = get_github_file_url(repo_owner, repo_name, branch, file_name)
-        # st.write(file_name)
-        
-        df = pd.read_excel(file_name, engine = 'pyxlsb', sheet_name = 'Report')
-        # st.write('Done loading ', file_name)   
-                
-        # Set name for columns
-        df.columns = ["Type",                  # 0
-                      "WO",                    # 1
-                      "2",                     # 2 WO_Linked
-                      "3",                     # 3 Valuation_type
-                      "4",                     # 4
-                      "PM_MP",                 # 5
-                      "Description",           # 6
-                      "Project_type",          # 7
-                      "8",                     # 8 Won/Lost
-                      "9",                     # 9
-                      "10",                    # 10 ACPE_status
-                      "Project_tier",          # 11
-                      "12",                    # 12 Invoice_type
-                      "13",                    # 13
-                      "14",                    # 14
-                      "Contract_2d_invoiced",  # 15
-                      "16",                    # 16
-                      "17",                    # 17
-                      "18",                    # 18
-                      "19",                    # 19
-                      "20",                    # 20
-                      "21",                    # 21
-                      "Contract_2d_total",     # 22
-                      "Contract_budget",       # 23
-                      "Cost_2d_total",         # 24
-                      "Cost_2d_txt",           # 25
-                      "Cost_2d_subcon",        # 26
-                      "Cost_2d_others",        # 27
-                      "Cost_budget_total",     # 28
-                      "Cost_budget_txt",       # 29
-                      "Cost_budget_subcon",    # 30
-                      "Cost_budget_contin",    # 31
-                      "Cost_budget_others",    # 32
-                      "Cost_4cast_total",      # 33
-                      "Cost_4cast_txt",        # 34
-                      "Cost_4cast_subcon",     # 35
-                      "Cost_4cast_contin",     # 36
-                      "Cost_4cast_others",     # 37
-                      "Date_budget",           # 38
-                      "Date_4cast",            # 39
-                      "Ratio_invoiced %",      # 40
-                      "Ratio_spent %",         # 41
-                      "Ratio_txt %",           # 42
-                      "43",                    # 43
-                      "PR_month",              # 44
-                      "PR_year",               # 45
-                      "PR_2date",              # 46
-                      "PR_budgeted_selling",   # 47
-                      "PR_4casted",            # 48
-                      "PR_4casted_execution",  # 49
-                      "PR_net_year",           # 50
-                      "PR_net_2date",          # 51
-                      "52",                    # 52
-                      "53",                    # 53
-                      "54",                    # 54
-                      "55",                    # 55
-                      "56",                    # 56
-                      "57",                    # 57
-                      "58",                    # 58
-                      "4cast_change_pr",       # 59
-                      "4cast_change_contin",   # 60
-                      "61",                    # 61
-                      "62",                    # 62
-                      "63",                    # 63
-                      "64",                    # 64
-                      "65",                    # 65
-                      "66",                    # 66
-                      "67",                    # 67
-                      "Outstanding_inv",       # 68
-                      "69",                    # 69
-                      "70",                    # 70
-                      "Inv_oldest_unpaid",     # 71
-                      "Inv_most_recent",       # 72
-                      "Inv_base",              # 73
-                      "WIP_gross",             # 74
-                      "Inv_cost",              # 75
-                      "WIP_net",               # 76
-                      "77",                    # 77
-                      "78",                    # 78
-                      "79",                    # 79
-                      "80",                    # 80
-                      "81",                    # 81
-                      "82",                    # 82
-                      "Workload_firm",         # 83
-                      "WO_date_start",         # 84
-                      "WO_date_end",           # 85
-                      "86",                    # 86 Outstanding_com
-                      "Customer",              # 87
-                      "88",                    # 88
-                      "89",                    # 89 Department
-                      "90",                    # 90
-                      "91",                    # 91 PM_project
-                      "92",                    # 92 PM_workoder
-                      "93",                    # 93 ADAG
-                      "94",                    # 94 Project_admin
-                      "95",                    # 95 Project_controller
-                      "96",                    # 96
-                      "97",                    # 97
-                      "98",                    # 98
-                      "99"                     # 99
-                      ]
-        
-        
-        # Delete the first 17 rows of trivial info
-        df = df.iloc[17:]
-        df.reset_index(drop=True, inplace=True)
-        
-        
-        # Delete all blank rows
-        df = df[df["Type"] != "MPZ"]
-           
-                
-        # Delete all columns with name as a number
-        columns = [x for x in df.columns if not x.isdigit()]
-        df = df[columns]
-        
-        
-        # Change format of columns to float & currency
-        columns = [x for x in df.columns if x.startswith('Contract') or 
-                                            x.startswith('Cost') or 
-                                            x.startswith('PR') or 
-                                            x.startswith('4cast') or 
-                                            x.startswith('Outstanding_inv') or 
-                                            x.startswith('Inv_base') or
-                                            x.startswith('Inv_cost') or 
-                                            x.startswith('WIP') or 
-                                            x.startswith('Workload_firm') ]
-        df[columns] = df[columns].astype(float)
-        df[columns] = df[columns] * rate
-        
-        
-        # Change format of columns to float
-        columns = [x for x in df.columns if x.startswith('Ratio')]
-        df[columns] = df[columns].astype(float)
-        df[columns] = df[columns]
-        
-        
-        # Change format of columns to Date
-        columns = [x for x in df.columns if ('Date' in x) or
-                                            ('WO_date' in x) or
-                                            ('Inv_oldest' in x) or
-                                            ('Inv_most' in x) ]
-        for col in columns:
-            df[col] = df[col].fillna(1)
-            df[col] = df[col].apply(excel_float_to_datetime)
-            
-            
-        # Add a column to identify Entity
-        df["Entity"] = entity
-            
-        
-        # Change format of columns to Category
-        columns = ["Type", "WO", "PM_MP", "Project_type", "Project_tier", "Entity"]
-        df[columns] = df[columns].astype("category")
-        
-        
-        # Store df to data
-        self.data = df
-
-
-
-    def to_excel(self, excel_file_name : str): 
-        
-        # =====================================================================
-        # This function prints the whole dataframe into an Excel file
-        # =====================================================================
-        
-        # Create a Pandas Excel writer using xlsxwriter as the engine
-        writer = pd.ExcelWriter(excel_file_name + ".xlsx", engine="xlsxwriter")
-        
-        # Convert the dataframe to an xlsxwriter Excel object
-        self.data.to_excel(writer, sheet_name=self.name, index=False)
-        
-        workbook  = writer.book
-        worksheet = writer.sheets[self.name]
-        
-        # Filter numeric columns to be formatted
-        columns = [x for x in self.data.columns if x.startswith('Contract') or 
-                                                   x.startswith('Cost') or  
-                                                   x.startswith('PR') or 
-                                                   x.startswith('4cast') or 
-                                                   x.startswith('Outstanding_inv') or 
-                                                   x.startswith('Inv_base') or
-                                                   x.startswith('Inv_cost') or 
-                                                   x.startswith('WIP') or 
-                                                   x.startswith('Workload_firm') ]
-        
-        # Define a format for comma style
-        comma_format = workbook.add_format({'num_format': '#,##0'})
-        comma_format = workbook.add_format({'num_format': 44})
-        
-        # Apply the comma format to the numeric columns
-        for col in columns:
-            col_idx = self.data.columns.get_loc(col)  # get_loc returns zero-based index, add 1 for Excel column index
-            worksheet.set_column(col_idx, col_idx, None, comma_format)
-           
-        # Save the Excel file
-        writer.close()
-        
-        
-        
-    def df_2_dict(self):
-        
-        # =====================================================================
-        # This function converts a dataframe to a nested dictionary of
-        # Master projects, Projects, Workorders
-        # =====================================================================
-        
-        # Convert each row into a dictionary
-        row_dicts = {}
-        for index, row in self.data.iterrows():
-            row_dicts[row['WO']] = row.to_dict()
-            
-        # Remove the 'WO' key from each dictionary
-        for key in row_dicts:
-            del row_dicts[key]['WO']
-            
-        # Seperate dictionaries of MPs, PRs and WOs
-        dict_pr = {}
-        dict_wo = {}
-        
-        
-        for key, value in row_dicts.items():
-            new_dict = {'main' : value}
-            if len(key) == 6:
-                self.dict_mp[key] = new_dict
-            elif len(key) == 10:
-                dict_pr[key] = new_dict
-            elif len(key) == 14:
-                dict_wo[key] = new_dict
-              
-                
-        for key, value in dict_wo.items():
-            for item in dict_pr:
-                if (item in key):
-                    dict_pr[item][key] = value
-                    break 
-                  
-                    
-        for key, value in dict_pr.items():
-            for item in self.dict_mp:
-                if (item in key):
-                    self.dict_mp[item][key] = value
-                    break                           
-
-
-
-    def statistic(self, *args):
-        
-        # =====================================================================
-        # This function does a statistic for an entity
-        # =====================================================================
-        
-        unique_mp = self.data['WO'].apply(lambda x: x if len(x) == 6  else None).unique() 
-        unique_pr = self.data['WO'].apply(lambda x: x if len(x) == 10 else None).unique() 
-        unique_wo = self.data['WO'].apply(lambda x: x if len(x) == 14 else None).unique() 
-        unique_pm = self.data['PM_MP'].unique()     
-                
-        self.stat['mp_list'] = unique_mp.tolist()
-        self.stat['mp_no'] = len(self.stat['mp_list'])
-        
-        self.stat['pr_list'] = unique_pr.tolist()
-        self.stat['pr_no'] = len(self.stat['pr_list'])
-        
-        self.stat['wo_list'] = unique_wo.tolist()
-        self.stat['wo_no'] = len(self.stat['wo_list'])
-        
-        self.stat['pm_list'] = unique_pm.tolist()
-        self.stat['pm_no'] = len(self.stat['pm_list'])
-        
-        Contract_budget = self.data.loc[self.data['Type'] == 'MP', 'Contract_budget'].sum()
-        Contract_2d_invoiced = self.data.loc[self.data['Type'] == 'MP', 'Contract_2d_invoiced'].sum()
-        Contract_2d_total = self.data.loc[self.data['Type'] == 'MP', 'Contract_2d_total'].sum()
-        Outstanding_inv = self.data.loc[self.data['Type'] == 'MP', 'Outstanding_inv'].sum()
-        Workload_firm = self.data.loc[self.data['Type'] == 'MP', 'Workload_firm'].sum()
-        
-        self.stat['Contract_budget'] = Contract_budget
-        self.stat['Contract_2d_invoiced'] = Contract_2d_invoiced
-        self.stat['Contract_2d_total'] = Contract_2d_total
-        self.stat['Outstanding_inv'] = Outstanding_inv
-        self.stat['Workload_firm'] = Workload_firm
-        
-        for ar in args:
-            if ar == 'Print':
-                print('Contract budgetted  {:17,.0f}'.format(Contract_budget))
-                print('Contract invoiced   {:17,.0f}'.format(Contract_2d_invoiced))
-                print('Contract to date    {:17,.0f}'.format(Contract_2d_total))
-                print('Outstanding invoice {:17,.0f}'.format(Outstanding_inv))
-                print('Workload firm       {:17,.0f}'.format(Workload_firm))                    
-     
-        
- 
-# =============================================================================
-# 
-# Web-app
-# 
-# =============================================================================
-
-class streaming:
-    def __init__(self):
-
-        repo_owner = 'chitn'
-        repo_name = 'trial'
-        branch = 'main'            
-        data_file = get_github_list_data_file(repo_owner, repo_name, branch)
-        
-        self.data_file = data_file[::-1]
-        
-        self.source = pd.DataFrame()
-                
-        # Initialise a page
-        st.set_page_config(layout="wide")
-        st.title("Visualisation of pcb012 | Maritime Vietnam AG")
-                
-        if 'source' not in st.session_state:
-            st.session_state.source = pd.DataFrame()
-    
-        # self.input_single()
-        self.input_form()
-        
-        self.source = st.session_state.source
-        
-        self.online()
-            
-    
-    # =========================================================================
-    # NEED A SERIOUS UPDATE ON SUBMIT_BUTTON FUNCTION TO OPERATE PROPERLY
-    # =========================================================================
-    def input_form_long(self):
-        # Create a form
-        with st.form(key='pcb012'):
-            num_items = st.number_input('Number of entities', 
-                                        min_value = 1, 
-                                        max_value = 10, 
-                                        value = 1)
-            items = []
-            for i in range(num_items):
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    entity = st.selectbox(f'Entity {i+1}', 
-                                          ['VN', 'NL', 'UK', 'SG', 'PH', 'ML'], 
-                                          key=f'entity_{i+1}')
-                with col2:
-                    rate = st.number_input(f'Rate {i+1}', key = f'rate_{i+1}') 
-                with col3:   
-                    file_name = st.text_input(f'File name {i+1}', key = f'name_{i+1}')
-                items.append({"Entity": entity, "Rate": rate, "File name": file_name})
-                
-            submit_button = st.form_submit_button(label = "Submit")
-            
-            
-        if submit_button:
-            tmp = pd.DataFrame()
-            
-            # Create a DataFrame from the input data
-            df = pd.DataFrame(items)            
-            for index, row in df.iterrows():
-                new = xlsb_file(row["File name"]+".xlsb", row["Entity"])
-                tmp = pd.concat([tmp, new.data], 
-                                 ignore_index = True, 
-                                 sort = False)            
-            self.source = tmp
-            
-            self.switch_on = True
-    # =========================================================================
-    # NEED A SERIOUS UPDATE ON SUBMIT_BUTTON FUNCTION TO OPERATE PROPERLY
-    # =========================================================================
-            
-            
-            
-    def input_form(self):
-        # Create a form
-        with st.form(key='pcb012'):
-            suffices = ['VN', 'NL', 'UK', 'SG', 'PH', 'ML']
-            rates = [0] * 6
-            col1, col2, col3, col4, col5, col6 = st.columns(6) 
-            with col1:                
-                base_name = st.selectbox('Base pcb012 name', 
-                                         self.data_file,
-                                         key='name', index=0)
-            with col2:
-                xrate = st.number_input('SHOWN IN EUR | EUR->VND:', 
-                                        key='base', value=26600)           
-                rates[0] = 1.0
-                rates[1] = xrate
-            with col3:
-                rates[2] = st.number_input('UK | GBP->VND: 32,000', key='rate_uk', value=32000)
-            with col4:
-                rates[3] = st.number_input('SG | SGD->VND: 18,750', key='rate_sg', value=18750)
-            with col5:
-                rates[4] = st.number_input('PH | PHP->VND: 440', key='rate_ph', value=440)
-            with col6:
-                rates[5] = st.number_input('ML | MYR->VND: 5,700', key='rate_ml', value=5700) 
-                
-            submit_button = st.form_submit_button(label = "Submit")
-            
-            
-        if submit_button:    
-            tmp = pd.DataFrame()
-            
-            # Create a DataFrame from the input data
-            for rate, suffix in zip(rates, suffices):
-                if rate != 0:
-                    name = base_name + "_" + suffix + ".xlsb"  
-                    try:
-                        # st.write(get_github_file_url('chitn', 'trial', 'main', name))                        
-                        new = xlsb_file(name, suffix, rate / xrate)
-                        tmp = pd.concat([tmp, new.data], 
-                                        ignore_index = True, 
-                                        sort = False)  
-                    except:
-                        st.write(name + " does not exit, cannot be accessed or contains no data.")
-            
-            st.session_state.source = tmp
-                        
-            self.source = st.session_state.source
-            
-            
-            
-    def input_single(self):
-        pcb012_vn = xlsb_file("pcb012a_2451 VN.xlsb", "VN", 1)
-        pcb012_nl = xlsb_file("pcb012a_2451 NL.xlsb", "NL", 26600)
-        
-        tmp = pd.concat([pcb012_vn.data, pcb012_nl.data],
-                        ignore_index = True, 
-                        sort = False)
-        
-        st.session_state.source = tmp
-                    
-        self.source = st.session_state.source
-        
-        
-
-    def online(self):            
-        # Define tabs for pcb012
-        tab_info, tab_cnc, tab_pr, tab_wo, tab_result, tab_all = st.tabs(["012 | Info",
-                                                                          "012 | Contract & Cost",
-                                                                          "012 | Contract & Cost - PR",
-                                                                          "012 | Contract & Cost - WO",
-                                                                          "012 | Project results",
-                                                                          "012 | All"])
-                
-        incline = 75
-        top = 20
-        
-        
-        with tab_info:
-            data = st.session_state.source
-            
-            if data.shape[0] == 0:
-                st.write('Need to load data first...')
-            else:
-                columns = ["PM_MP", "Entity", "Type", "WO", "Description", 
-                           "Project_type", "Project_tier", "Customer", "WO_date_start", "WO_date_end", 
-                           "Contract_budget", "Contract_2d_invoiced",
-                           "Outstanding_inv", "Workload_firm"]
-                
-                # filter_df = filter_dataframe(data[columns], "Filters for Info")
-                filter_df = data[columns]
-                st.dataframe(filter_df)
-                
-                st.header("Some high-level statistics...")
-                
-                entities = filter_df["Entity"].unique()
-                
-                if len(entities) > 0:
-                                        
-                    stat = []
-                    stat_ = []
-                    for entity in entities:
-                        numb_mp = filter_df[(filter_df["Entity"] == entity) &
-                                            (filter_df["Type"] == "MP")]["Type"].count()
-                        numb_proposal = filter_df[(filter_df["Entity"] == entity) &
-                                                  (filter_df["Type"] == "MP") &
-                                                  (filter_df["Contract_budget"] < 1)]["Type"].count()
-                        numb_wo = filter_df[(filter_df["Entity"] == entity) &
-                                            (filter_df["Type"] == "WO")]["Type"].count()
-                        numb_customer = filter_df[filter_df["Entity"] == entity]["Customer"].nunique()
-                        contract_budget = "{:,.0f}".format(filter_df[filter_df["Entity"] == entity]["Contract_budget"].sum())
-                        contract_invoiced = "{:,.0f}".format(filter_df[filter_df["Entity"] == entity]["Contract_2d_invoiced"].sum())
-                        workload = "{:,.0f}".format(filter_df[filter_df["Entity"] == entity]["Workload_firm"].sum())
-                        outstanding = "{:,.0f}".format(filter_df[filter_df["Entity"] == entity]["Outstanding_inv"].sum())
-                    
-                        stat.append([entity, str(numb_mp)+" ("+str(numb_proposal)+")", numb_wo, numb_customer, contract_budget, contract_invoiced, workload, outstanding])
-                        stat_.append([entity, numb_mp, numb_wo, numb_customer, 
-                                      float(contract_budget.replace(',', '')), 
-                                      float(contract_invoiced.replace(',', '')), 
-                                      float(workload.replace(',', '')), 
-                                      float(outstanding.replace(',', ''))])
-                    
-                        
-                    # Graphics statistics
-                    # transpose stat by first using zip to transpose then convert tuples to lists
-                    stat_ = list(zip(*stat_))
-                    stat_ = [list(item) for item in stat_]
-    
-                    col1, col2, col3, col4 = st.columns(4)
-                    
-                    with col1:
-                        # Create a pie chart
-                        fig, ax = plt.subplots()
-                        ax.set_title('Number of work orders')
-                        ax.pie(stat_[2], labels=stat_[0], autopct='%1.f%%', startangle=90)
-                        ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-                        
-                        # Display the pie chart in Streamlit
-                        st.pyplot(fig)
-                        
-                    with col2:
-                        # Create a pie chart
-                        fig, ax = plt.subplots()
-                        ax.set_title('Contract budget')
-                        ax.pie(stat_[4], labels=stat_[0], autopct='%1.1f%%', startangle=90)
-                        ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-                        
-                        # Display the pie chart in Streamlit
-                        st.pyplot(fig)
-                        
-                    with col3:
-                        # Create a pie chart
-                        fig, ax = plt.subplots()
-                        ax.set_title('Contract invoiced')
-                        ax.pie(stat_[5], labels=stat_[0], autopct='%1.1f%%', startangle=90)
-                        ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-                        
-                        # Display the pie chart in Streamlit
-                        st.pyplot(fig)
-                        
-                    with col4:
-                        # Create a pie chart
-                        fig, ax = plt.subplots()
-                        ax.set_title('Outstanding invoice')
-                        ax.pie(stat_[7], labels=stat_[0], autopct='%1.1f%%', startangle=90)
-                        ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-                        
-                        # Display the pie chart in Streamlit
-                        st.pyplot(fig)
-            
-                    
-                    # tabular statistics                      
-                    texts = ["Entity", "# PnPs", "# WOs", "# Cust.", "Contract budget", "Contract invoiced", "Workload remained", "Outs. invoice"]
-                    cols = st.columns([1, 1, 1, 1, 2, 2, 2, 2])
-                    for j in range(8):
-                        with cols[j]:
-                            st.markdown(f"<div style='font-size:20px;font-weight:bold;'><strong>{texts[j]}</strong></div>", unsafe_allow_html=True)
-                            
-                    cols = st.columns([1, 1, 1, 1, 2, 2, 2, 2])
-                    for i in range(len(stat)):
-                        for j in range(8): 
-                            with cols[j]:
-                                st.markdown(f"<div style='font-size:16px;'><strong>{stat[i][j]}</strong></div>", unsafe_allow_html=True)
-            
-        with tab_cnc:             
-            data = st.session_state.source
-            
-            if data.shape[0] == 0:
-                st.write('Need to load data first...')
-            else:
-                columns = ["PM_MP", "Entity", "WO", "Description", 
-                           "Contract_2d_invoiced", "Contract_2d_total", "Contract_budget", 
-                           "Cost_2d_total", "Cost_budget_total", "Cost_4cast_total", 
-                           "WIP_gross", "WIP_net", 
-                           "Outstanding_inv", "Inv_oldest_unpaid", "Inv_most_recent", "Inv_base", "Inv_cost", 
-                           "Ratio_spent %", "Workload_firm", "Type"]
-                
-                filter_df = filter_dataframe(data[columns], "Filters for Contract & Cost")
-                filter_df = filter_df[filter_df['Type'] == 'MP']
-                st.dataframe(filter_df)
-                
-                # =============================================================
-                st.subheader("Contract & Cost | Master projects")
-                
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    # Create a pie chart
-                    conditions = (filter_df['Contract_budget'] > 0) & (filter_df['Type'] == 'MP')
-                    df_plot = filter_df[conditions].nlargest(10,'Contract_budget').sort_values(by=['Contract_budget'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Master projects | Contract budget')
-                    ax.pie(df_plot['Contract_budget'], labels=df_plot['WO'], autopct='%1.f%%', startangle=90)
-                    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-                    
-                    # Display the pie chart in Streamlit
-                    st.pyplot(fig)
-                    
-                with col2:
-                    # Create a bar chart
-                    conditions = (filter_df['Contract_budget'] > 0) & (filter_df['Type'] == 'MP')
-                    df_plot = filter_df[conditions].nlargest(top,'Ratio_spent %').sort_values(by=['Ratio_spent %'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Master projects | Invoiced / Budget')
-                    ax.bar(df_plot['WO'], df_plot['Contract_2d_invoiced'] / df_plot['Contract_budget'] * 100, label=df_plot['WO'])
-                    ax.set_ylim(0,120)
-                    ax.grid(color='gray', linestyle='dashed')
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('Percentage of invoiced')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-                with col3:
-                    # Create a bar chart
-                    conditions = (filter_df['Contract_budget'] > 0) & (filter_df['Type'] == 'MP')
-                    df_plot = filter_df[conditions].nlargest(top,'Workload_firm').sort_values(by=['Workload_firm'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Master projects | Workload firm')
-                    ax.bar(df_plot['WO'], df_plot['Workload_firm'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('Worload remaining [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-                with col4:
-                    # Create a bar chart
-                    conditions = (filter_df['Contract_budget'] > 0) & (filter_df['Type'] == 'MP')
-                    df_plot = filter_df[conditions].nlargest(top,'Outstanding_inv').sort_values(by=['Outstanding_inv'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Master projects | Outstanding invoices')
-                    ax.bar(df_plot['WO'], df_plot['Outstanding_inv'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('Amount [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-            
-                # =============================================================
-                st.subheader("Statistics...")
-                
-                pms = filter_df["PM_MP"].unique()
-                
-                if len(pms) > 0:
-                    
-                    texts = ["PM", "# PnPs", "WIP", "Workload remained", "Contract budget", "Contract invoiced", "Cost to-date", "Out. invoice"]
-                    cols = st.columns([2, 1, 1, 2, 1.5, 1.5, 1.5, 1.5])
-                    for j in range(8):
-                        with cols[j]:
-                            st.markdown(f"<div style='font-size:20px;font-weight:bold;'><strong>{texts[j]}</strong></div>", unsafe_allow_html=True)
-                                                                    
-                    for pm in pms:
-                        numb_mp = filter_df[(filter_df["PM_MP"] == pm) &
-                                            (filter_df["Type"] == "MP")]["Type"].count()
-                        numb_wo = filter_df[(filter_df["PM_MP"] == pm) &
-                                            (filter_df["Type"] == "WO")]["Type"].count()
-                        numb_customer = 0
-                        contract_budget = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Contract_budget"].sum())
-                        contract_invoiced = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Contract_2d_invoiced"].sum())
-                        cost_2d = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Cost_2d_total"].sum())
-                        wip_gross = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["WIP_gross"].sum())
-                        workload = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Workload_firm"].sum())
-                        outstanding = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Outstanding_inv"].sum())
-                    
-                        initials = pm # ''.join([word[0] for word in pm.split()[:-1]]) + '. ' + pm.split()[-1]
-                        stat = [initials, numb_mp, wip_gross, workload, contract_budget, contract_invoiced, cost_2d, outstanding]
-                                                
-                        cols = st.columns([2, 1, 1, 2, 1.5, 1.5, 1.5, 1.5])
-                        for j in range(8): 
-                            with cols[j]:
-                                st.markdown(f"<div style='font-size:16px;'><strong>{stat[j]}</strong></div>", unsafe_allow_html=True)
-                    
-            
-            
-        with tab_pr:             
-            data = st.session_state.source
-            
-            if data.shape[0] == 0:
-                st.write('Need to load data first...')
-            else:
-                columns = ["PM_MP", "Entity", "WO", "Description",  
-                           "Cost_2d_total", "Cost_2d_txt", "Cost_2d_subcon", "Cost_2d_others", 
-                           "Cost_budget_total", "Cost_budget_txt", "Cost_budget_subcon", "Cost_budget_contin", "Cost_budget_others", 
-                           "Cost_4cast_total", "Cost_4cast_txt", "Cost_4cast_subcon", "Cost_4cast_contin", "Cost_4cast_others", 
-                           "4cast_change_pr", "4cast_change_contin", 
-                           "Ratio_invoiced %", "Ratio_spent %", "Ratio_txt %",  
-                           "Date_budget", "Date_4cast", "Type"]
-                
-                filter_df = filter_dataframe(data[columns], "Filters for Contract & Cost - PR (choose one PM for stat.)")
-                filter_df = filter_df[filter_df['Type'] == 'PR']
-                st.dataframe(filter_df)
-                
-                # =============================================================
-                st.header("Contract & Cost | Projects")
-                
-                col1, col2, col3, col4 = st.columns(4)  
-                
-                with col1:
-                    # Create a bar chart
-                    conditions = (filter_df['Cost_budget_total'] > 0)
-                    df_plot = filter_df[conditions].nlargest(top,'Cost_budget_total').sort_values(by=['Cost_budget_total'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Projects | Cost budgetted')
-                    ax.bar(df_plot['WO'], df_plot['Cost_budget_total'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_yscale("log")
-                    ax.set_ylim(10**2,2*10**6)
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('Cost budgetted [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-                with col2:
-                    # Create a bar chart
-                    conditions = (filter_df['Cost_2d_total'] > 0)
-                    df_plot = filter_df[conditions].nlargest(top,'Cost_2d_total').sort_values(by=['Cost_2d_total'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Projects | Cost to-date')
-                    ax.bar(df_plot['WO'], df_plot['Cost_2d_total'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_yscale("log")
-                    ax.set_ylim(10**2,2*10**6)
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('Cost to-date [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-                with col3:
-                    # Create a bar chart
-                    conditions = (filter_df['Cost_budget_contin'] > 0)
-                    df_plot = filter_df[conditions].nlargest(top,'Cost_budget_contin').sort_values(by=['Cost_budget_contin'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Projects | Contingency')
-                    ax.bar(df_plot['WO'], df_plot['Cost_budget_contin'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_yscale("log")
-                    ax.set_ylim(10**2,2*10**6)
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('Contingency [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-                with col4:
-                    # Create a bar chart
-                    conditions = (filter_df['Ratio_spent %'] > 0) & (filter_df['Ratio_spent %'] < 120)
-                    df_plot = filter_df[conditions].nlargest(round(top*1.5),'Ratio_spent %').sort_values(by=['Ratio_spent %'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Projects | Ratio_spent %')
-                    ax.bar(df_plot['WO'], df_plot['Ratio_spent %'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_ylim(0,120)
-                    plt.xticks(rotation=90)
-                    plt.ylabel('Budget spent [%]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-            
-                # =============================================================
-                st.subheader("Statistics...")
-                
-                pms = filter_df["PM_MP"].unique()
-                
-                if len(pms) > 0:                    
-                    texts = ["PM", "# PnPs", "Cost to-date", "Cost budget", "Budget cont.", "Budget subcon", "Cost 4cast", "4cast cont."]
-                    cols = st.columns([2, 1, 1.5, 1.5, 1.5, 1.5, 1.5, 1.5])
-                    for j in range(8):
-                        with cols[j]:
-                            st.markdown(f"<div style='font-size:20px;font-weight:bold;'><strong>{texts[j]}</strong></div>", unsafe_allow_html=True)
-                                                                    
-                    for pm in pms:
-                        numb_pr = filter_df[(filter_df["PM_MP"] == pm) &
-                                            (filter_df["Type"] == "PR")]["Type"].count()
-                        cost_2d = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Cost_2d_total"].sum())
-                        cost_budget = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Cost_budget_total"].sum())
-                        cost_4cast = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Cost_4cast_total"].sum())
-                        budget_contin = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Cost_budget_contin"].sum())
-                        budget_subcon = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Cost_budget_subcon"].sum())
-                        forecast_contin = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Cost_4cast_contin"].sum())
-                    
-                        initials = pm # ''.join([word[0] for word in pm.split()[:-1]]) + '. ' + pm.split()[-1]
-                        stat = [initials, numb_pr, cost_2d, cost_budget, budget_contin, budget_subcon, cost_4cast, forecast_contin]
-                                                
-                        cols = st.columns([2, 1, 1.5, 1.5, 1.5, 1.5, 1.5, 1.5])
-                        for j in range(8): 
-                            with cols[j]:
-                                st.markdown(f"<div style='font-size:16px;'><strong>{stat[j]}</strong></div>", unsafe_allow_html=True)
-        
-        
-        with tab_wo:            
-            data = st.session_state.source
-            
-            if data.shape[0] == 0:
-                st.write('Need to load data first...')
-            else:
-                columns = ["PM_MP", "Entity", "WO", "Description",  
-                           "Cost_2d_total", "Cost_2d_txt", "Cost_2d_subcon", "Cost_2d_others", 
-                           "Cost_budget_total", "Cost_budget_txt", "Cost_budget_subcon", "Cost_budget_contin", "Cost_budget_others", 
-                           "Cost_4cast_total", "Cost_4cast_txt", "Cost_4cast_subcon", "Cost_4cast_contin", "Cost_4cast_others", 
-                           "4cast_change_contin", 
-                           "Ratio_invoiced %", "Ratio_spent %", "Ratio_txt %",  
-                           "Date_budget", "Date_4cast", "Type"]
-                
-                filter_df = filter_dataframe(data[columns], "Filters for Contract & Cost - WO (choose one PM for stat.)")
-                filter_df = filter_df[filter_df['Type'] == 'WO']
-                st.dataframe(filter_df)
-                
-                # =============================================================
-                st.header("Contract & Cost | Workorders")
-                
-                col1, col2, col3, col4 = st.columns(4)  
-                
-                with col1:
-                    # Create a bar chart
-                    conditions = (filter_df['Cost_budget_total'] > 0)
-                    df_plot = filter_df[conditions].nlargest(top,'Cost_budget_total').sort_values(by=['Cost_budget_total'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Projects | Cost budgetted')
-                    ax.bar(df_plot['WO'], df_plot['Cost_budget_total'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_yscale("log")
-                    ax.set_ylim(10**2,2*10**6)
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('Cost budgetted [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-                with col2:
-                    # Create a bar chart
-                    conditions = (filter_df['Cost_2d_total'] > 0)
-                    df_plot = filter_df[conditions].nlargest(top,'Cost_2d_total').sort_values(by=['Cost_2d_total'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Projects | Cost to-date')
-                    ax.bar(df_plot['WO'], df_plot['Cost_2d_total'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_yscale("log")
-                    ax.set_ylim(10**2,2*10**6)
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('Cost to-date [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-                with col3:
-                    # Create a bar chart
-                    conditions = (filter_df['Cost_budget_contin'] > 0)
-                    df_plot = filter_df[conditions].nlargest(top,'Cost_budget_contin').sort_values(by=['Cost_budget_contin'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Projects | Contingency')
-                    ax.bar(df_plot['WO'], df_plot['Cost_budget_contin'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_yscale("log")
-                    ax.set_ylim(10**2,2*10**6)
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('Contingency [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-                with col4:
-                    # Create a bar chart
-                    conditions = (filter_df['Ratio_spent %'] > 0) & (filter_df['Ratio_spent %'] < 120)
-                    df_plot = filter_df[conditions].nlargest(round(top*1.5),'Ratio_spent %').sort_values(by=['Ratio_spent %'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Projects | Ratio_spent %')
-                    ax.bar(df_plot['WO'], df_plot['Ratio_spent %'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_ylim(0,120)
-                    plt.xticks(rotation=90)
-                    plt.ylabel('Budget spent [%]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-            
-                # =============================================================
-                st.subheader("Statistics...")
-                
-                pms = filter_df["PM_MP"].unique()
-                
-                if len(pms) > 0:                    
-                    texts = ["PM", "# PnPs", "Cost to-date", "Cost budget", "Budget cont.", "Budget subcon", "Cost 4cast", "4cast cont."]
-                    cols = st.columns([2, 1, 1.5, 1.5, 1.5, 1.5, 1.5, 1.5])
-                    for j in range(8):
-                        with cols[j]:
-                            st.markdown(f"<div style='font-size:20px;font-weight:bold;'><strong>{texts[j]}</strong></div>", unsafe_allow_html=True)
-                                                                    
-                    for pm in pms:
-                        numb_wo = filter_df[(filter_df["PM_MP"] == pm) &
-                                            (filter_df["Type"] == "WO")]["Type"].count()
-                        cost_2d = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Cost_2d_total"].sum())
-                        cost_budget = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Cost_budget_total"].sum())
-                        cost_4cast = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Cost_4cast_total"].sum())
-                        budget_contin = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Cost_budget_contin"].sum())
-                        budget_subcon = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Cost_budget_subcon"].sum())
-                        forecast_contin = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["Cost_4cast_contin"].sum())
-                    
-                        initials = pm # ''.join([word[0] for word in pm.split()[:-1]]) + '. ' + pm.split()[-1]
-                        stat = [initials, numb_wo, cost_2d, cost_budget, budget_contin, budget_subcon, cost_4cast, forecast_contin]
-                                                
-                        cols = st.columns([2, 1, 1.5, 1.5, 1.5, 1.5, 1.5, 1.5])
-                        for j in range(8): 
-                            with cols[j]:
-                                st.markdown(f"<div style='font-size:16px;'><strong>{stat[j]}</strong></div>", unsafe_allow_html=True)
-            
-            
-            
-        with tab_result:
-            data = st.session_state.source
-            
-            if data.shape[0] == 0:
-                st.write('Need to load data first...')
-            else:
-                columns = ["PM_MP", "Entity", "WO", "Description", 
-                           "PR_month", "PR_year", "PR_2date", "PR_net_year", "PR_net_2date", 
-                           "PR_budgeted_selling", 
-                           "PR_4casted", "PR_4casted_execution", "4cast_change_pr", "Type"]
-                
-                filter_df = filter_dataframe(data[columns], "Filters for Project results (choose one PM for stat.)")
-                filter_df = filter_df[filter_df['Type'] == 'MP']
-                st.dataframe(filter_df)
-                
-                # =============================================================
-                st.header("Project results")
-                
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    # Create a bar chart
-                    conditions = (filter_df['PR_month'] > 0)
-                    df_plot = filter_df[conditions].nlargest(top,'PR_month').sort_values(by=['PR_month'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Master projects | POSITIVE Result this month')
-                    ax.bar(df_plot['WO'], df_plot['PR_month'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_yscale("log")
-                    ax.set_ylim(10,5*10**5)
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('POSITIVE Result this month [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-                with col2:
-                    # Create a bar chart
-                    conditions = (filter_df['PR_net_2date'] > 0)
-                    df_plot = filter_df[conditions].nlargest(top,'PR_net_2date').sort_values(by=['PR_net_2date'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Master projects | POSITIVE Result to-date')
-                    ax.bar(df_plot['WO'], df_plot['PR_net_2date'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_yscale("log")
-                    ax.set_ylim(10,5*10**5)
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('POSITIVE Result to-date [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-                with col3:
-                    # Create a bar chart
-                    conditions = (filter_df['PR_4casted'] > 0)
-                    df_plot = filter_df[conditions].nlargest(top,'PR_4casted').sort_values(by=['PR_4casted'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Master projects | POSITIVE Result forcasted')
-                    ax.bar(df_plot['WO'], df_plot['PR_4casted'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_yscale("log")
-                    ax.set_ylim(10,5*10**5)
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('POSITIVE Result forcasted [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-                with col4:
-                    # Create a pie chart
-                    conditions = (filter_df['PR_4casted'] > 0)
-                    df_plot = filter_df[conditions].nlargest(10,'PR_4casted').sort_values(by=['PR_4casted'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Master projects | POSITIVE Result forcasted')
-                    ax.pie(df_plot['PR_4casted'], labels=df_plot['WO'], autopct='%1.f%%', startangle=90)
-                    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-                    
-                    # Display the pie chart in Streamlit
-                    st.pyplot(fig)
-                    
-                    
-                    
-                col1, col2, col3, col4 = st.columns(4)
-                
-                with col1:
-                    # Create a bar chart
-                    conditions = (filter_df['PR_month'] < 0)
-                    df_plot = filter_df[conditions].nsmallest(top,'PR_month').sort_values(by=['PR_month'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Master projects | NEGATIVE Result this month')
-                    ax.bar(df_plot['WO'], -df_plot['PR_month'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_yscale("log")
-                    ax.set_ylim(10,5*10**5)
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('NEGATIVE Result this month [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                                                      
-                with col2:
-                    # Create a bar chart
-                    conditions = (filter_df['PR_net_2date'] < 0)
-                    df_plot = filter_df[conditions].nsmallest(top,'PR_net_2date').sort_values(by=['PR_net_2date'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Master projects | NEGATIVE Result to-date')
-                    ax.bar(df_plot['WO'], -df_plot['PR_net_2date'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_yscale("log")
-                    ax.set_ylim(10,5*10**5)
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('NEGATIVE Result to-date [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                                                      
-                with col3:
-                    # Create a bar chart
-                    conditions = (filter_df['PR_4casted'] < 0)
-                    df_plot = filter_df[conditions].nsmallest(top,'PR_4casted').sort_values(by=['PR_4casted'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Master projects | NEGATIVE Result forcasted')
-                    ax.bar(df_plot['WO'], -df_plot['PR_4casted'], label=df_plot['WO'])
-                    ax.grid(color='gray', linestyle='dashed')
-                    ax.set_yscale("log")
-                    ax.set_ylim(10,5*10**5)
-                    plt.xticks(rotation=incline)
-                    plt.ylabel('NEGATIVE Result forcasted [EUR]')
-                    
-                    # Display the bar chart in Streamlit
-                    st.pyplot(fig)
-                    
-                with col4:
-                    # Create a pie chart
-                    conditions = (filter_df['PR_4casted'] < 0)
-                    df_plot = filter_df[conditions].nsmallest(10,'PR_4casted').sort_values(by=['PR_4casted'])
-                    fig, ax = plt.subplots()
-                    ax.set_title('Master projects | NEGATIVE Result forcasted')
-                    ax.pie(-df_plot['PR_4casted'], labels=df_plot['WO'], autopct='%1.f%%', startangle=90)
-                    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-                    
-                    # Display the pie chart in Streamlit
-                    st.pyplot(fig)
-                    
-            
-                # =============================================================
-                st.subheader("Statistics...")
-                
-                pms = filter_df["PM_MP"].unique()
-                
-                if len(pms) > 0:                        
-                    texts = ["PM", "# PnPs", "PR month", "PR year", "PR to-date", "PR 4cast"]
-                    cols = st.columns([2, 1, 1.5, 1.5, 1.5, 1.5])
-                    for j in range(6):
-                        with cols[j]:
-                            st.markdown(f"<div style='font-size:20px;font-weight:bold;'><strong>{texts[j]}</strong></div>", unsafe_allow_html=True)
-                                                                    
-                    for pm in pms:
-                        numb_mp = filter_df[(filter_df["PM_MP"] == pm) &
-                                            (filter_df["Type"] == "MP")]["Type"].count()
-                        pr_month = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["PR_month"].sum())
-                        pr_year = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["PR_year"].sum())
-                        pr_2date = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["PR_2date"].sum())
-                        pr_4casted = "{:,.0f}".format(filter_df[filter_df["PM_MP"] == pm]["PR_4casted"].sum())
-                    
-                        initials = pm # ''.join([word[0] for word in pm.split()[:-1]]) + '. ' + pm.split()[-1]
-                        stat = [initials, numb_mp, pr_month, pr_year, pr_2date, pr_4casted]
-                                                
-                        cols = st.columns([2, 1, 1.5, 1.5, 1.5, 1.5])
-                        for j in range(6): 
-                            with cols[j]:
-                                st.markdown(f"<div style='font-size:16px;'><strong>{stat[j]}</strong></div>", unsafe_allow_html=True)
-  
-        with tab_all:
-            data = st.session_state.source
-            
-            if data.shape[0] == 0:
-                st.write('Need to load data first...')
-            else:
-                st.dataframe(data)
-
-# =============================================================================
-# 
-# Streaming now
-# 
-# =============================================================================            
-trial = streaming()
-
-
+import streamlit as st
+
+import pandas as pd
+
+import os
+import time
+import pickle
+import functools
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from pcb012_core import (
+    lazy_module,
+    get_github_catalogue,
+    xlsb_file,
+    profile_dataframe,
+    build_search_indexes,
+    compile_filter,
+    TOP, 
+    DEFAULT_RATES, 
+    INFO_COLUMNS, 
+    TABS,
+    rank_index,
+    rank_top,
+    customer_dimension,
+    concat_customers,
+    AGEING_LEVELS,
+    ageing_summary,
+    stat_pm,
+    rollup_cube,
+    concat_cubes,
+    concat_search_indexes,
+    TREND_MEASURES, 
+    TREND_COLUMNS,
+    scale_snapshot,
+    diff_snapshots,
+    seen_weeks,
+    DIFF_TOLERANCE,
+    current_spans,
+    start_spans,
+    span,
+    register_dataset,
+    register_session,
+    start_tracing,
+    memory_report,
+    EXPORT_FORMATS,
+    EXPORT_MIME,
+    export_bytes,
+    start_compute_pool,
+    run_compute,
+    ingest_task,
+    render_task,
+    frame_from_bytes,
+)
+
+# matplotlib is only imported when the first chart is drawn
+plt = lazy_module("matplotlib.pyplot")
+
+
+
+# =============================================================================
+# 
+# Streamlit supporting functions
+# 
+# =============================================================================
+
+# function to generate a filtering-enable dataframe
+def filter_dataframe(df : pd.DataFrame, columns : list, checkbox_name : str, 
+                     profile : dict, conditions : list = None, 
+                     search : dict = None, download : str = None) -> pd.DataFrame:
+    """
+    Reference: https://blog.streamlit.io/auto-generate-a-dataframe-filtering-ui-in-streamlit-with-filter_dataframe/
+    
+    The widgets are built from `profile` (see profile_dataframe), which is 
+    computed once when the data is loaded. The user's choices are added to
+    `conditions`, compiled into one mask and applied once to `columns`.
+    Text conditions use the prebuilt indexes in `search` when available.
+    With `download` (a file name), the filtered view can be downloaded.
+    """
+    conditions = list(conditions or [])
+    
+    modify = st.checkbox(checkbox_name, key=f"{checkbox_name}_modify")
+
+    if modify:
+        modification_container = st.container()
+    
+        with modification_container:
+            to_filter_columns = st.multiselect("Filter dataframe on", columns,
+                                               key=f"{checkbox_name}_columns")
+            
+            # Values are collected in a form, so typing or dragging a slider
+            # only reruns the tab once "Apply filters" is pressed (debouncing)
+            with st.form(key=f"{checkbox_name}_form"):
+                for column in to_filter_columns:
+                    left, right = st.columns((1, 20))
+                    info = profile[column]
+                    
+                    if info["kind"] == "category":
+                        user_cat_input = right.multiselect(
+                            f"Values for {column}",
+                            info["values"],
+                            default=info["values"],
+                            key=f"{checkbox_name}_{column}",
+                        )
+                        if len(user_cat_input) < len(info["values"]):
+                            conditions.append((column, "isin", user_cat_input))
+                        
+                    elif info["kind"] == "number":
+                        _min = info["min"]
+                        _max = info["max"]
+                        step = (_max - _min) / 100
+                        user_num_input = right.slider(
+                            f"Values for {column}",
+                            key=f"{checkbox_name}_{column}",
+                            min_value=_min,
+                            max_value=_max,
+                            value=(_min, _max),
+                            step=step,
+                        )
+                        if user_num_input != (_min, _max):
+                            conditions.append((column, "between", user_num_input))
+                        
+                    elif info["kind"] == "date":
+                        user_date_input = right.date_input(
+                            f"Values for {column}",
+                            key=f"{checkbox_name}_{column}",
+                            value=(
+                                info["min"],
+                                info["max"],
+                            ),
+                        )
+                        if len(user_date_input) == 2 and user_date_input != (info["min"], info["max"]):
+                            user_date_input = tuple(map(pd.to_datetime, user_date_input))
+                            conditions.append((column, "between", user_date_input))
+                            
+                    else:
+                        user_text_input = right.text_input(
+                            f"Substring or regex in {column}",
+                            key=f"{checkbox_name}_{column}",
+                        )
+                        if user_text_input:
+                            conditions.append((column, "contains", user_text_input))
+                            
+                st.form_submit_button("Apply filters")
+             
+    # # Format all float data
+    # float_columns = df.select_dtypes(include=['float64', 'float']).columns
+    # format_dict = {col: '{:.2f}' for col in float_columns}
+    # df = df.style.format(format_dict)
+    
+    # The filters applied to the view, see view_stat_pm
+    st.session_state[f"{checkbox_name}_applied"] = conditions
+    
+    if not conditions:
+        view = df[columns]
+    else:
+        view = df.loc[compile_filter(df, conditions, search), columns]
+        
+    if download:
+        download_view(view, download, (columns, conditions))
+        
+    return view
+
+
+
+# Label of the filters of each tab, see filter_dataframe
+FILTER_LABELS = {"cnc":    "Filters for Contract & Cost",
+                 "pr":     "Filters for Contract & Cost - PR (choose one PM for stat.)",
+                 "wo":     "Filters for Contract & Cost - WO (choose one PM for stat.)",
+                 "result": "Filters for Project results (choose one PM for stat.)"}
+
+
+
+# function to compute the statistics per PM of the view of a tab: from the 
+# rollup cube when its filters only select values of the cube dimensions,
+# otherwise from the rows of the view
+def view_stat_pm(view : pd.DataFrame, tab : str) -> pd.DataFrame:
+    conditions = st.session_state.get(f"{FILTER_LABELS[tab]}_applied")
+    cube = st.session_state.get("cube")
+    if cube is not None and conditions is not None and cube.covers(conditions):
+        return cube.stat_pm(conditions, TABS[tab]["stat"])
+    return stat_pm(view, TABS[tab]["stat"])
+
+
+
+# function to select the rows of a top-N chart of a tab in its view, with 
+# the rank index of the dataset (see rank_top)
+def view_top(view : pd.DataFrame, tab : str, name : str) -> pd.DataFrame:
+    return rank_top(st.session_state.get("ranks"), st.session_state.source, view, 
+                    *TABS[tab]["tops"][name])
+
+
+
+# function to offer a view for download in every export format
+# The file is only serialised when its button is clicked (deferred data),
+# cached on the loaded dataset and `state` (e.g. the filters of the view);
+# clicking does not rerun the app
+def download_view(view : pd.DataFrame, name : str, state = None):
+    key = repr((st.session_state.get("version"), name, state))
+    
+    cols = st.columns(len(EXPORT_FORMATS) + 3)
+    for col, fmt in zip(cols, EXPORT_FORMATS):
+        col.download_button(f"Download {fmt}", 
+                            data=functools.partial(export_bytes, view, fmt, key), 
+                            file_name=f"{name}.{fmt}", 
+                            mime=EXPORT_MIME[fmt], 
+                            on_click="ignore", 
+                            key=f"{name}_download_{fmt}")
+
+
+
+# Worker processes shared by all sessions for the ingest of snapshots and the
+# rendering of charts to PNG (the aggregations and the figures themselves are
+# built in the session, see the compute service of the core), started once 
+# per server process; None without workers
+@st.cache_resource(show_spinner=False)
+def compute_pool():
+    return start_compute_pool()
+
+
+
+# function to run a task on the shared workers; when a worker died, the 
+# pool is replaced and the task runs here
+def compute(func, *args):
+    try:
+        return run_compute(compute_pool(), func, *args)
+    except BrokenProcessPool:
+        compute_pool.clear()
+        return func(*args)
+
+
+
+# function to display a matplotlib figure and release it; pyplot keeps every
+# figure it creates until it is closed
+# With workers, the figure is rendered to PNG in one of them
+def show_figure(fig):
+    if compute_pool() is None:
+        st.pyplot(fig)
+    else:
+        st.image(compute(render_task, pickle.dumps(fig)), width="stretch")
+    plt.close(fig)
+
+
+
+# Number of runs kept in the performance panel
+SPAN_HISTORY = 20
+
+# File to which the spans of every run are appended as one line of JSON;
+# nothing is written when it is not set
+SPAN_LOG = os.environ.get("PCB012_SPAN_LOG")
+
+
+
+# function to close the span log of a run, keep it for the performance panel 
+# and append it to the JSON log
+def finish_spans(log):
+    log.close()
+    
+    history = st.session_state.setdefault("spans", [])
+    history.append(log)
+    del history[:-SPAN_HISTORY]
+    
+    if SPAN_LOG:
+        try:
+            log.write_json(SPAN_LOG)
+        except OSError as e:
+            print('Cannot write the span log: ', e)
+
+
+
+# function to time the body of a tab as a span
+# A tab rerun on its own (as a fragment) is recorded as a run of its own
+def timed_tab(name : str):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self):
+            log = current_spans.get()
+            own = log is None or log.closed
+            if own:
+                log = start_spans("tab " + name)
+            
+            with span("tab." + name):
+                func(self)
+                
+            if own:
+                finish_spans(log)
+        return wrapper
+    return decorator
+
+
+
+# =============================================================================
+# 
+# Weekly snapshots and multi-week trends
+# 
+# =============================================================================
+
+# function to load one weekly snapshot of one entity, in its own currency
+# The result is cached per (week, entity) and shared by all sessions; the 
+# snapshot is read and cleaned on the shared workers
+# The cached frame itself is returned (st.cache_resource), not a copy of it: 
+# it is only read, derived frames share its columns (copy-on-write)
+@st.cache_resource(show_spinner=False, max_entries=512)
+def load_snapshot(base_name : str, entity : str) -> pd.DataFrame:
+    df = frame_from_bytes(compute(ingest_task, base_name + "_" + entity + ".xlsb", entity, 1.0))
+    register_dataset("snapshot", base_name + "_" + entity, df)
+    return df
+
+
+
+# function to get the catalogue of the snapshots on GitHub, read once per
+# process (see github_catalogue)
+def snapshot_catalogue():
+    return get_github_catalogue('chitn', 'trial', 'main')
+
+
+
+# function to load a range of weeks into one frame indexed by (WO, Week)
+# `rates` is a tuple of (entity, rate); snapshots that do not exist are skipped
+# Returns the trend and the snapshots that failed otherwise, as a list of 
+# (name, error), see show_trend_failures
+@st.cache_resource(show_spinner=False, max_entries=32)
+def load_trend(weeks : tuple, rates : tuple) -> tuple:
+    ctx = get_script_run_ctx()
+    failures = []
+    
+    def load(job):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        week, entity, rate = job
+        try:
+            df = scale_snapshot(load_snapshot(week, entity), rate)[TREND_COLUMNS]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print('Trend: loading', week + "_" + entity, 'failed:', repr(e))
+            failures.append((week + "_" + entity + ".xlsb", repr(e)))
+            return None
+        df = df.astype({"WO": str, "Type": str, "PM_MP": str, "Entity": str})
+        df.insert(0, "Week", int(week))
+        return df
+    
+    # Snapshots are downloaded and parsed concurrently; only those in the
+    # catalogue are asked for
+    catalogue = snapshot_catalogue()
+    jobs = [(week, entity, rate) for week in weeks for entity, rate in rates 
+            if entity in catalogue.entities(week)]
+    # (each job runs in a copy of the context, so its spans reach the log of this run)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, load, job) for job in jobs]
+        frames = [df for df in (x.result() for x in futures) if df is not None]
+    
+    if len(frames) == 0:
+        return pd.DataFrame(columns=["Week"] + TREND_COLUMNS).set_index(["WO", "Week"]), sorted(failures)
+        
+    trend = pd.concat(frames, ignore_index=True, sort=False)
+    trend = trend.set_index(["WO", "Week"]).sort_index()
+    register_dataset("trend", f"{min(weeks)}-{max(weeks)}", trend)
+    
+    return trend, sorted(failures)
+
+
+
+# function to warn about the snapshots missing from the trend of `weeks` and
+# `rates` (as given to load_trend) because they failed to load; only that
+# trend is dropped from the shared cache, the next rerun tries it again
+def show_trend_failures(failures : list, weeks : tuple, rates : tuple):
+    if len(failures) == 0:
+        return
+    load_trend.clear(weeks, rates)
+    st.warning("Not in the trend, failed to load: " + 
+               ", ".join(name + " (" + error + ")" for name, error in failures))
+
+
+
+# Weeks shown by the trend tab until others are chosen, the newest included
+TREND_WEEKS = 8
+
+# Warm-up of the shared cache: the newest week of the catalogue and the 
+# PCB012_WARMUP_WEEKS weeks before it (by default the rest of the weeks of 
+# the trend tab) are loaded for all entities, newest first, as soon as the 
+# server process runs this file, then every PCB012_WARMUP_INTERVAL seconds 
+# (0: only once). PCB012_WARMUP=0 turns it off
+# Streamlit only runs this file for a session: to warm up before the first 
+# user, a deploy can run it once with server.scriptHealthCheckEnabled=true 
+# and a request to /_stcore/script-health-check
+WARMUP = os.environ.get("PCB012_WARMUP", "1") != "0"
+WARMUP_WEEKS = int(os.environ.get("PCB012_WARMUP_WEEKS", str(TREND_WEEKS - 1)))
+WARMUP_INTERVAL = float(os.environ.get("PCB012_WARMUP_INTERVAL", "0"))
+
+
+
+# function to load the newest weeks of the catalogue into the shared cache
+def warmup(weeks : int = WARMUP_WEEKS):
+    start = time.perf_counter()
+    catalogue = snapshot_catalogue()
+    selected = catalogue.weeks()[-(weeks + 1):]
+    jobs = [(week, entity) for week in selected[::-1] for entity in catalogue.entities(week)]
+    
+    def load(job):
+        try:
+            load_snapshot(*job)
+            return True
+        except Exception:
+            return False
+        
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        loaded = sum(pool.map(load, jobs))
+        
+    print('Warm-up:', loaded, 'of', len(jobs), 'snapshots of', selected, 
+          'loaded in {:.1f}s'.format(time.perf_counter() - start))
+
+
+
+# function to run the warm-up in the background, once per server process
+# (st.cache_resource); it then repeats on its interval when one is set
+@st.cache_resource(show_spinner=False)
+def start_warmup():
+    if not WARMUP:
+        return None
+    
+    def run():
+        while True:
+            try:
+                warmup()
+            except Exception as e:
+                print('Warm-up failed: ', e)
+            if WARMUP_INTERVAL <= 0:
+                break
+            time.sleep(WARMUP_INTERVAL)
+            
+    thread = threading.Thread(target=run, name="pcb012-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+
+# =============================================================================
+# 
+# Web-app
+# 
+# =============================================================================
+
+class streaming:
+    def __init__(self):
+        
+        # Every stage of this rerun is timed, see the performance panel
+        spans = start_spans("rerun")
+        
+        # Allocations are traced on request, see the memory panel
+        if os.environ.get("PCB012_TRACEMALLOC"):
+            start_tracing(int(os.environ["PCB012_TRACEMALLOC"]))
+
+        # The weeks come from the catalogue, which is refreshed at most once
+        # per CATALOGUE_TTL, not on every rerun
+        self.catalogue = snapshot_catalogue()
+        data_file = self.catalogue.weeks()
+        
+        self.data_file = data_file[::-1]
+        
+        self.source = pd.DataFrame()
+                
+        # Initialise a page
+        st.set_page_config(layout="wide")
+        st.title("Visualisation of pcb012 | Maritime Vietnam AG")
+                
+        if 'source' not in st.session_state:
+            st.session_state.source = pd.DataFrame()
+            st.session_state.profile = {}
+            st.session_state.search = {}
+            st.session_state.cube = None
+            st.session_state.ranks = None
+            st.session_state.customers = None
+            st.session_state.partitions = {}
+            st.session_state.rates = {}
+    
+        # self.input_single()
+        self.input_form()
+        
+        self.source = st.session_state.source
+        
+        self.online()
+        
+        finish_spans(spans)
+        self.performance_panel()
+        
+        # The dataset is measured when it is loaded (see register_data); a
+        # rerun only measures its span history
+        register_session(get_script_run_ctx().session_id, 
+                         {"spans": st.session_state.get("spans", [])})
+        # The memory panel is an admin view, opened with ?admin=1
+        if st.query_params.get("admin") == "1":
+            self.memory_panel()
+            
+    
+    # =========================================================================
+    # NEED A SERIOUS UPDATE ON SUBMIT_BUTTON FUNCTION TO OPERATE PROPERLY
+    # =========================================================================
+    def input_form_long(self):
+        # Create a form
+        with st.form(key='pcb012'):
+            num_items = st.number_input('Number of entities', 
+                                        min_value = 1, 
+                                        max_value = 10, 
+                                        value = 1)
+            items = []
+            for i in range(num_items):
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    entity = st.selectbox(f'Entity {i+1}', 
+                                          ['VN', 'NL', 'UK', 'SG', 'PH', 'ML'], 
+                                          key=f'entity_{i+1}')
+                with col2:
+                    rate = st.number_input(f'Rate {i+1}', key = f'rate_{i+1}') 
+                with col3:   
+                    file_name = st.text_input(f'File name {i+1}', key = f'name_{i+1}')
+                items.append({"Entity": entity, "Rate": rate, "File name": file_name})
+                
+            submit_button = st.form_submit_button(label = "Submit")
+            
+            
+        if submit_button:
+            tmp = pd.DataFrame()
+            
+            # Create a DataFrame from the input data
+            df = pd.DataFrame(items)            
+            for index, row in df.iterrows():
+                new = xlsb_file(row["File name"]+".xlsb", row["Entity"])
+                tmp = pd.concat([tmp, new.data], 
+                                 ignore_index = True, 
+                                 sort = False)            
+            self.source = tmp
+            
+            self.switch_on = True
+    # =========================================================================
+    # NEED A SERIOUS UPDATE ON SUBMIT_BUTTON FUNCTION TO OPERATE PROPERLY
+    # =========================================================================
+            
+            
+            
+    def input_form(self):
+        # Create a form
+        with st.form(key='pcb012'):
+            suffices = ['VN', 'NL', 'UK', 'SG', 'PH', 'ML']
+            rates = [0] * 6
+            col1, col2, col3, col4, col5, col6 = st.columns(6) 
+            with col1:                
+                base_name = st.selectbox('Base pcb012 name', 
+                                         self.data_file,
+                                         format_func=lambda x: x + " | " + " ".join(self.catalogue.entities(x)),
+                                         key='name', index=0)
+            with col2:
+                xrate = st.number_input('SHOWN IN EUR | EUR->VND:', 
+                                        key='base', value=DEFAULT_RATES['NL'])           
+                rates[0] = 1.0
+                rates[1] = xrate
+            with col3:
+                rates[2] = st.number_input('UK | GBP->VND: 32,000', key='rate_uk', value=DEFAULT_RATES['UK'])
+            with col4:
+                rates[3] = st.number_input('SG | SGD->VND: 18,750', key='rate_sg', value=DEFAULT_RATES['SG'])
+            with col5:
+                rates[4] = st.number_input('PH | PHP->VND: 440', key='rate_ph', value=DEFAULT_RATES['PH'])
+            with col6:
+                rates[5] = st.number_input('ML | MYR->VND: 5,700', key='rate_ml', value=DEFAULT_RATES['ML']) 
+                
+            submit_button = st.form_submit_button(label = "Submit")
+            
+        with st.expander("Available snapshots"):
+            matrix = self.catalogue.matrix()
+            st.dataframe(matrix.replace({True: "✓", False: ""}))
+            
+            
+        if submit_button:    
+            # Entities without a snapshot for the week are not loaded
+            available = self.catalogue.entities(base_name)
+            for rate, suffix in zip(rates, suffices):
+                if rate != 0 and suffix not in available:
+                    st.write(base_name + "_" + suffix + ".xlsb does not exit.")
+            wanted = {suffix: rate / xrate for rate, suffix in zip(rates, suffices) if rate != 0}
+            self.update_partitions(base_name, {x: rate for x, rate in wanted.items() if x in available})
+            
+            st.session_state.rates = wanted
+            # identifies the loaded dataset, e.g. for the cached downloads
+            st.session_state.version = repr((base_name, st.session_state.rates))
+            self.register_data()
+                        
+            self.source = st.session_state.source
+            
+            
+            
+    def update_partitions(self, base_name : str, rates : dict):
+        # The dataset is a set of partitions, one per entity, each with its 
+        # search indexes and cube. Only the entities whose week or rate 
+        # changed are dropped or loaded; the dataset and its aggregates are 
+        # then combined from the partitions
+        # A combined partition keeps the range of its rows in the dataset
+        # rather than a copy of them, but keeps its search indexes, cube and
+        # customers next to the combined ones (about 1 MiB for the 6 entities
+        # of a week, more than the rows), so that a changed entity does not 
+        # rebuild them for the others (about 23 ms per entity)
+        # The profile and the rank index are rebuilt from the whole dataset:
+        # about 20 ms together, next to about 200 ms to load one entity, and
+        # merging them from per-partition ones measured no faster
+        partitions = st.session_state.partitions
+        source = st.session_state.source
+        changed = False
+        
+        for suffix in list(partitions):
+            if partitions[suffix]["key"] != (base_name, rates.get(suffix)):
+                with span("drop", entity=suffix):
+                    del partitions[suffix]
+                changed = True
+                
+        for suffix, rate in rates.items():
+            if suffix in partitions:
+                continue
+            name = base_name + "_" + suffix + ".xlsb"
+            try:
+                # st.write(get_github_file_url('chitn', 'trial', 'main', name))                        
+                with span("load", file=name):
+                    data = scale_snapshot(load_snapshot(base_name, suffix), rate)
+                with span("partition", file=name):
+                    partitions[suffix] = {"key": (base_name, rate), 
+                                          "data": data, 
+                                          "search": build_search_indexes(data), 
+                                          "cube": rollup_cube(data, base_name), 
+                                          "customers": customer_dimension(data)}
+                changed = True
+            except Exception:
+                st.write(name + " cannot be accessed or contains no data.")
+                
+        if not changed:
+            return
+        
+        # Partitions are combined in the order of the form
+        parts = [partitions[x] for x in ['VN', 'NL', 'UK', 'SG', 'PH', 'ML'] if x in partitions]
+        if len(parts) == 0:
+            st.session_state.source = pd.DataFrame()
+            st.session_state.profile = {}
+            st.session_state.search = {}
+            st.session_state.cube = None
+            st.session_state.ranks = None
+            st.session_state.customers = None
+            return
+        
+        with span("concat"):
+            frames = [x["data"] if "data" in x else source.iloc[x["rows"][0]:x["rows"][1]] for x in parts]
+            tmp = pd.concat(frames, 
+                            ignore_index = True, 
+                            sort = False)  
+        start = 0
+        for part, frame in zip(parts, frames):
+            part["rows"] = (start, start + len(frame))
+            part.pop("data", None)
+            start += len(frame)
+        st.session_state.source = tmp
+        with span("profile"):
+            st.session_state.profile = profile_dataframe(tmp)
+        with span("search_index"):
+            st.session_state.search = concat_search_indexes([x["search"] for x in parts])
+        with span("cube"):
+            st.session_state.cube = concat_cubes([x["cube"] for x in parts])
+        with span("rank_index"):
+            st.session_state.ranks = rank_index(tmp)
+        with span("customers"):
+            st.session_state.customers = concat_customers([x["customers"] for x in parts])
+            
+            
+            
+    def input_single(self):
+        pcb012_vn = xlsb_file("pcb012a_2451 VN.xlsb", "VN", 1)
+        pcb012_nl = xlsb_file("pcb012a_2451 NL.xlsb", "NL", 26600)
+        
+        tmp = pd.concat([pcb012_vn.data, pcb012_nl.data],
+                        ignore_index = True, 
+                        sort = False)
+        
+        st.session_state.source = tmp
+        st.session_state.version = repr(("2451", {"VN": 1, "NL": 26600}))
+        st.session_state.profile = profile_dataframe(tmp)
+        st.session_state.search = build_search_indexes(tmp)
+        st.session_state.cube = rollup_cube(tmp, "2451")
+        st.session_state.ranks = rank_index(tmp)
+        st.session_state.customers = customer_dimension(tmp)
+        self.register_data()
+                    
+        self.source = st.session_state.source
+        
+        
+        
+    def register_data(self):
+        # Records the size of the dataset of the session, see the memory
+        # panel; called once per loaded dataset
+        with span("memory"):
+            register_session(get_script_run_ctx().session_id, 
+                             {"source": st.session_state.source, 
+                              "profile": st.session_state.profile, 
+                              "search": st.session_state.search, 
+                              "cube": st.session_state.cube, 
+                              "ranks": st.session_state.ranks, 
+                              "customers": st.session_state.customers, 
+                              "partitions": st.session_state.partitions})
+        
+        
+
+    def performance_panel(self):
+        # Timing spans of the last runs, in the sidebar on request
+        if not st.sidebar.checkbox("Performance", key="performance"):
+            return
+        
+        history = st.session_state.get("spans", [])
+        if len(history) == 0:
+            return
+        
+        runs = pd.DataFrame([{"Run": log.run, 
+                              "Started": log.to_dict()["started"], 
+                              "Seconds": log.seconds, 
+                              "Slowest": max(log.spans, key=lambda x: x["seconds"])["name"] if log.spans else ""} 
+                             for log in history[::-1]])
+        st.sidebar.dataframe(runs, hide_index=True)
+        
+        index = st.sidebar.selectbox("Run", range(len(history)), 
+                                     format_func=lambda i: f"{runs['Run'][i]} | {runs['Started'][i]}")
+        log = history[::-1][index]
+        st.sidebar.metric("Total seconds", f"{log.seconds:.3f}")
+        st.sidebar.dataframe(log.to_frame(), hide_index=True)
+        
+        
+        
+    def memory_panel(self):
+        # Memory of the process, of every session, of the loaded datasets 
+        # and of the open figures
+        report = memory_report()
+        mb = 1024 ** 2
+        
+        st.sidebar.subheader("Memory")
+        process = report["process"]
+        col1, col2 = st.sidebar.columns(2)
+        col1.metric("RSS [MB]", "-" if process["rss"] is None else f"{process['rss'] / mb:,.1f}")
+        col2.metric("Peak [MB]", "-" if process["peak_rss"] is None else f"{process['peak_rss'] / mb:,.1f}")
+        
+        sessions = pd.DataFrame([{"Session": key[:8], **{k: v / mb for k, v in value["items"].items()}, "Total": value["bytes"] / mb}
+                                 for key, value in report["sessions"].items()])
+        st.sidebar.write("Sessions [MB]")
+        st.sidebar.dataframe(sessions, hide_index=True)
+        
+        datasets = pd.DataFrame([{"Dataset": key, "Rows": value["rows"], "MB": value["bytes"] / mb} 
+                                 for key, value in report["datasets"].items()])
+        st.sidebar.write("Datasets as loaded [MB]")
+        st.sidebar.dataframe(datasets, hide_index=True)
+        
+        st.sidebar.write(f"Open figures: {report['figures']['open']} ({report['figures']['bytes'] / mb:,.1f} MB)")
+        
+        if report["tracemalloc"] is not None:
+            traced = report["tracemalloc"]
+            st.sidebar.write(f"Traced: {traced['current'] / mb:,.1f} MB, peak {traced['peak'] / mb:,.1f} MB")
+            st.sidebar.dataframe(pd.DataFrame(traced["top"]), hide_index=True)
+        
+        
+        
+    def online(self):            
+        # Define tabs for pcb012
+        tab_info, tab_cnc, tab_pr, tab_wo, tab_result, tab_trend, tab_diff, tab_all = st.tabs(["012 | Info",
+                                                                                               "012 | Contract & Cost",
+                                                                                               "012 | Contract & Cost - PR",
+                                                                                               "012 | Contract & Cost - WO",
+                                                                                               "012 | Project results",
+                                                                                               "012 | Trend",
+                                                                                               "012 | Diff",
+                                                                                               "012 | All"])
+                
+        # Each tab re-executes on its own as a fragment, so touching its
+        # filters does not rerun the page (nor the GitHub calls in __init__)
+        self.incline = 75
+        self.top = TOP
+        
+        
+        with tab_info:
+            self.tab_info()
+
+        with tab_cnc:
+            self.tab_cnc()
+
+        with tab_pr:
+            self.tab_pr()
+
+        with tab_wo:
+            self.tab_wo()
+
+        with tab_result:
+            self.tab_result()
+
+        with tab_trend:
+            self.tab_trend()
+
+        with tab_diff:
+            self.tab_diff()
+
+        with tab_all:
+            self.tab_all()
+
+
+
+    @st.fragment
+    @timed_tab("info")
+    def tab_info(self):
+        data = st.session_state.source
+        
+        if data.shape[0] == 0:
+            st.write('Need to load data first...')
+        else:
+            columns = INFO_COLUMNS
+            
+            # filter_df = filter_dataframe(data, columns, "Filters for Info", st.session_state.profile)
+            filter_df = data[columns]
+            download_view(filter_df, "pcb012_info")
+            st.dataframe(filter_df)
+            
+            st.header("Some high-level statistics...")
+            
+            table = st.session_state.cube.stat_entity()
+            
+            if table.shape[0] > 0:
+                
+                stat = [[entity, "{:.0f} ({:.0f})".format(row["# PnPs"], row["# Proposals"]), 
+                         int(row["# WOs"]), int(row["# Cust."])] + 
+                        ["{:,.0f}".format(x) for x in row.iloc[4:]] for entity, row in table.iterrows()]
+                
+                # Graphics statistics
+                stat_ = [table.index.tolist(), table["# PnPs"].tolist(), table["# WOs"].tolist(), 
+                         table["# Cust."].tolist(), table["Contract budget"].tolist(), 
+                         table["Contract invoiced"].tolist(), table["Workload remained"].tolist(), 
+                         table["Outs. invoice"].tolist()]
+
+                col1, col2, col3, col4 = st.columns(4)
+                
+                with col1:
+                    # Create a pie chart
+                    fig, ax = plt.subplots()
+                    ax.set_title('Number of work orders')
+                    ax.pie(stat_[2], labels=stat_[0], autopct='%1.f%%', startangle=90)
+                    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+                    
+                    # Display the pie chart in Streamlit
+                    show_figure(fig)
+                    
+                with col2:
+                    # Create a pie chart
+                    fig, ax = plt.subplots()
+                    ax.set_title('Contract budget')
+                    ax.pie(stat_[4], labels=stat_[0], autopct='%1.1f%%', startangle=90)
+                    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+                    
+                    # Display the pie chart in Streamlit
+                    show_figure(fig)
+                    
+                with col3:
+                    # Create a pie chart
+                    fig, ax = plt.subplots()
+                    ax.set_title('Contract invoiced')
+                    ax.pie(stat_[5], labels=stat_[0], autopct='%1.1f%%', startangle=90)
+                    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+                    
+                    # Display the pie chart in Streamlit
+                    show_figure(fig)
+                    
+                with col4:
+                    # Create a pie chart
+                    fig, ax = plt.subplots()
+                    ax.set_title('Outstanding invoice')
+                    ax.pie(stat_[7], labels=stat_[0], autopct='%1.1f%%', startangle=90)
+                    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+                    
+                    # Display the pie chart in Streamlit
+                    show_figure(fig)
+        
+                
+                # tabular statistics                      
+                texts = ["Entity", "# PnPs", "# WOs", "# Cust.", "Contract budget", "Contract invoiced", "Workload remained", "Outs. invoice"]
+                cols = st.columns([1, 1, 1, 1, 2, 2, 2, 2])
+                for j in range(8):
+                    with cols[j]:
+                        st.markdown(f"<div style='font-size:20px;font-weight:bold;'><strong>{texts[j]}</strong></div>", unsafe_allow_html=True)
+                        
+                cols = st.columns([1, 1, 1, 1, 2, 2, 2, 2])
+                for i in range(len(stat)):
+                    for j in range(8): 
+                        with cols[j]:
+                            st.markdown(f"<div style='font-size:16px;'><strong>{stat[i][j]}</strong></div>", unsafe_allow_html=True)
+                            
+                            
+            # Exposure per customer, across entities
+            st.header("Customers...")
+            
+            table = st.session_state.customers.view(data)
+            st.dataframe(table.style.format({label: "{:,.0f}" for label in table.columns[2:]}))
+            
+            
+            # Outstanding invoices per age of the oldest unpaid invoice, 
+            # bucketed at ingest
+            st.header("Receivables ageing...")
+            
+            level = st.selectbox("Ageing per", list(AGEING_LEVELS), 
+                                 format_func=lambda x: AGEING_LEVELS[x], key="ageing_level")
+            table = ageing_summary(data, AGEING_LEVELS[level])
+            st.dataframe(table.style.format({label: "{:,.0f}" for label in table.columns[1:]}))
+
+
+    @st.fragment
+    @timed_tab("cnc")
+    def tab_cnc(self):
+        data = st.session_state.source
+        
+        if data.shape[0] == 0:
+            st.write('Need to load data first...')
+        else:
+            columns = TABS["cnc"]["columns"]
+            
+            filter_df = filter_dataframe(data, columns, FILTER_LABELS["cnc"], 
+                                         st.session_state.profile, [("Type", "isin", [TABS["cnc"]["type"]])], 
+                                         st.session_state.search, download="pcb012_cnc")
+            st.dataframe(filter_df)
+            
+            # =============================================================
+            st.subheader("Contract & Cost | Master projects")
+            
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                # Create a pie chart
+                df_plot = view_top(filter_df, "cnc", "budget")
+                fig, ax = plt.subplots()
+                ax.set_title('Master projects | Contract budget')
+                ax.pie(df_plot['Contract_budget'], labels=df_plot['WO'], autopct='%1.f%%', startangle=90)
+                ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+                
+                # Display the pie chart in Streamlit
+                show_figure(fig)
+                
+            with col2:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "cnc", "spent")
+                fig, ax = plt.subplots()
+                ax.set_title('Master projects | Invoiced / Budget')
+                ax.bar(df_plot['WO'], df_plot['Contract_2d_invoiced'] / df_plot['Contract_budget'] * 100, label=df_plot['WO'])
+                ax.set_ylim(0,120)
+                ax.grid(color='gray', linestyle='dashed')
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('Percentage of invoiced')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+            with col3:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "cnc", "workload")
+                fig, ax = plt.subplots()
+                ax.set_title('Master projects | Workload firm')
+                ax.bar(df_plot['WO'], df_plot['Workload_firm'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('Worload remaining [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+            with col4:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "cnc", "outstanding")
+                fig, ax = plt.subplots()
+                ax.set_title('Master projects | Outstanding invoices')
+                ax.bar(df_plot['WO'], df_plot['Outstanding_inv'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('Amount [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+        
+            # =============================================================
+            st.subheader("Statistics...")
+            
+            table = view_stat_pm(filter_df, "cnc")
+            
+            if table.shape[0] > 0:
+                texts = ["PM"] + list(table.columns)
+                cols = st.columns([2, 1, 1, 2, 1.5, 1.5, 1.5, 1.5])
+                for j in range(len(texts)):
+                    with cols[j]:
+                        st.markdown(f"<div style='font-size:20px;font-weight:bold;'><strong>{texts[j]}</strong></div>", unsafe_allow_html=True)
+                                                                
+                for pm, row in table.iterrows():
+                    initials = pm # ''.join([word[0] for word in pm.split()[:-1]]) + '. ' + pm.split()[-1]
+                    stat = [initials, int(row.iloc[0])] + ["{:,.0f}".format(x) for x in row.iloc[1:]]
+                                            
+                    cols = st.columns([2, 1, 1, 2, 1.5, 1.5, 1.5, 1.5])
+                    for j in range(len(stat)): 
+                        with cols[j]:
+                            st.markdown(f"<div style='font-size:16px;'><strong>{stat[j]}</strong></div>", unsafe_allow_html=True)
+        
+        
+        
+    @st.fragment
+    @timed_tab("pr")
+    def tab_pr(self):
+        data = st.session_state.source
+        
+        if data.shape[0] == 0:
+            st.write('Need to load data first...')
+        else:
+            columns = TABS["pr"]["columns"]
+            
+            filter_df = filter_dataframe(data, columns, FILTER_LABELS["pr"], 
+                                         st.session_state.profile, [("Type", "isin", [TABS["pr"]["type"]])], 
+                                         st.session_state.search, download="pcb012_pr")
+            st.dataframe(filter_df)
+            
+            # =============================================================
+            st.header("Contract & Cost | Projects")
+            
+            col1, col2, col3, col4 = st.columns(4)  
+            
+            with col1:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "pr", "budget")
+                fig, ax = plt.subplots()
+                ax.set_title('Projects | Cost budgetted')
+                ax.bar(df_plot['WO'], df_plot['Cost_budget_total'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_yscale("log")
+                ax.set_ylim(10**2,2*10**6)
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('Cost budgetted [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+            with col2:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "pr", "cost")
+                fig, ax = plt.subplots()
+                ax.set_title('Projects | Cost to-date')
+                ax.bar(df_plot['WO'], df_plot['Cost_2d_total'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_yscale("log")
+                ax.set_ylim(10**2,2*10**6)
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('Cost to-date [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+            with col3:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "pr", "contingency")
+                fig, ax = plt.subplots()
+                ax.set_title('Projects | Contingency')
+                ax.bar(df_plot['WO'], df_plot['Cost_budget_contin'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_yscale("log")
+                ax.set_ylim(10**2,2*10**6)
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('Contingency [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+            with col4:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "pr", "spent")
+                fig, ax = plt.subplots()
+                ax.set_title('Projects | Ratio_spent %')
+                ax.bar(df_plot['WO'], df_plot['Ratio_spent %'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_ylim(0,120)
+                plt.xticks(rotation=90)
+                plt.ylabel('Budget spent [%]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+        
+            # =============================================================
+            st.subheader("Statistics...")
+            
+            table = view_stat_pm(filter_df, "pr")
+            
+            if table.shape[0] > 0:
+                texts = ["PM"] + list(table.columns)
+                cols = st.columns([2, 1, 1.5, 1.5, 1.5, 1.5, 1.5, 1.5])
+                for j in range(len(texts)):
+                    with cols[j]:
+                        st.markdown(f"<div style='font-size:20px;font-weight:bold;'><strong>{texts[j]}</strong></div>", unsafe_allow_html=True)
+                                                                
+                for pm, row in table.iterrows():
+                    initials = pm # ''.join([word[0] for word in pm.split()[:-1]]) + '. ' + pm.split()[-1]
+                    stat = [initials, int(row.iloc[0])] + ["{:,.0f}".format(x) for x in row.iloc[1:]]
+                                            
+                    cols = st.columns([2, 1, 1.5, 1.5, 1.5, 1.5, 1.5, 1.5])
+                    for j in range(len(stat)): 
+                        with cols[j]:
+                            st.markdown(f"<div style='font-size:16px;'><strong>{stat[j]}</strong></div>", unsafe_allow_html=True)
+        
+        
+        
+    @st.fragment
+    @timed_tab("wo")
+    def tab_wo(self):
+        data = st.session_state.source
+        
+        if data.shape[0] == 0:
+            st.write('Need to load data first...')
+        else:
+            columns = TABS["wo"]["columns"]
+            
+            filter_df = filter_dataframe(data, columns, FILTER_LABELS["wo"], 
+                                         st.session_state.profile, [("Type", "isin", [TABS["wo"]["type"]])], 
+                                         st.session_state.search, download="pcb012_wo")
+            st.dataframe(filter_df)
+            
+            # =============================================================
+            st.header("Contract & Cost | Workorders")
+            
+            col1, col2, col3, col4 = st.columns(4)  
+            
+            with col1:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "wo", "budget")
+                fig, ax = plt.subplots()
+                ax.set_title('Projects | Cost budgetted')
+                ax.bar(df_plot['WO'], df_plot['Cost_budget_total'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_yscale("log")
+                ax.set_ylim(10**2,2*10**6)
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('Cost budgetted [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+            with col2:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "wo", "cost")
+                fig, ax = plt.subplots()
+                ax.set_title('Projects | Cost to-date')
+                ax.bar(df_plot['WO'], df_plot['Cost_2d_total'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_yscale("log")
+                ax.set_ylim(10**2,2*10**6)
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('Cost to-date [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+            with col3:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "wo", "contingency")
+                fig, ax = plt.subplots()
+                ax.set_title('Projects | Contingency')
+                ax.bar(df_plot['WO'], df_plot['Cost_budget_contin'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_yscale("log")
+                ax.set_ylim(10**2,2*10**6)
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('Contingency [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+            with col4:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "wo", "spent")
+                fig, ax = plt.subplots()
+                ax.set_title('Projects | Ratio_spent %')
+                ax.bar(df_plot['WO'], df_plot['Ratio_spent %'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_ylim(0,120)
+                plt.xticks(rotation=90)
+                plt.ylabel('Budget spent [%]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+        
+            # =============================================================
+            st.subheader("Statistics...")
+            
+            table = view_stat_pm(filter_df, "wo")
+            
+            if table.shape[0] > 0:
+                texts = ["PM"] + list(table.columns)
+                cols = st.columns([2, 1, 1.5, 1.5, 1.5, 1.5, 1.5, 1.5])
+                for j in range(len(texts)):
+                    with cols[j]:
+                        st.markdown(f"<div style='font-size:20px;font-weight:bold;'><strong>{texts[j]}</strong></div>", unsafe_allow_html=True)
+                                                                
+                for pm, row in table.iterrows():
+                    initials = pm # ''.join([word[0] for word in pm.split()[:-1]]) + '. ' + pm.split()[-1]
+                    stat = [initials, int(row.iloc[0])] + ["{:,.0f}".format(x) for x in row.iloc[1:]]
+                                            
+                    cols = st.columns([2, 1, 1.5, 1.5, 1.5, 1.5, 1.5, 1.5])
+                    for j in range(len(stat)): 
+                        with cols[j]:
+                            st.markdown(f"<div style='font-size:16px;'><strong>{stat[j]}</strong></div>", unsafe_allow_html=True)
+        
+        
+        
+    @st.fragment
+    @timed_tab("result")
+    def tab_result(self):
+        data = st.session_state.source
+        
+        if data.shape[0] == 0:
+            st.write('Need to load data first...')
+        else:
+            columns = TABS["result"]["columns"]
+            
+            filter_df = filter_dataframe(data, columns, FILTER_LABELS["result"], 
+                                         st.session_state.profile, [("Type", "isin", [TABS["result"]["type"]])], 
+                                         st.session_state.search, download="pcb012_result")
+            st.dataframe(filter_df)
+            
+            # =============================================================
+            st.header("Project results")
+            
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "result", "month_positive")
+                fig, ax = plt.subplots()
+                ax.set_title('Master projects | POSITIVE Result this month')
+                ax.bar(df_plot['WO'], df_plot['PR_month'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_yscale("log")
+                ax.set_ylim(10,5*10**5)
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('POSITIVE Result this month [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+            with col2:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "result", "2date_positive")
+                fig, ax = plt.subplots()
+                ax.set_title('Master projects | POSITIVE Result to-date')
+                ax.bar(df_plot['WO'], df_plot['PR_net_2date'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_yscale("log")
+                ax.set_ylim(10,5*10**5)
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('POSITIVE Result to-date [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+            with col3:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "result", "4casted_positive")
+                fig, ax = plt.subplots()
+                ax.set_title('Master projects | POSITIVE Result forcasted')
+                ax.bar(df_plot['WO'], df_plot['PR_4casted'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_yscale("log")
+                ax.set_ylim(10,5*10**5)
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('POSITIVE Result forcasted [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+            with col4:
+                # Create a pie chart
+                df_plot = view_top(filter_df, "result", "4casted_positive_pie")
+                fig, ax = plt.subplots()
+                ax.set_title('Master projects | POSITIVE Result forcasted')
+                ax.pie(df_plot['PR_4casted'], labels=df_plot['WO'], autopct='%1.f%%', startangle=90)
+                ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+                
+                # Display the pie chart in Streamlit
+                show_figure(fig)
+                
+                
+                
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "result", "month_negative")
+                fig, ax = plt.subplots()
+                ax.set_title('Master projects | NEGATIVE Result this month')
+                ax.bar(df_plot['WO'], -df_plot['PR_month'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_yscale("log")
+                ax.set_ylim(10,5*10**5)
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('NEGATIVE Result this month [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                                                  
+            with col2:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "result", "2date_negative")
+                fig, ax = plt.subplots()
+                ax.set_title('Master projects | NEGATIVE Result to-date')
+                ax.bar(df_plot['WO'], -df_plot['PR_net_2date'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_yscale("log")
+                ax.set_ylim(10,5*10**5)
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('NEGATIVE Result to-date [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                                                  
+            with col3:
+                # Create a bar chart
+                df_plot = view_top(filter_df, "result", "4casted_negative")
+                fig, ax = plt.subplots()
+                ax.set_title('Master projects | NEGATIVE Result forcasted')
+                ax.bar(df_plot['WO'], -df_plot['PR_4casted'], label=df_plot['WO'])
+                ax.grid(color='gray', linestyle='dashed')
+                ax.set_yscale("log")
+                ax.set_ylim(10,5*10**5)
+                plt.xticks(rotation=self.incline)
+                plt.ylabel('NEGATIVE Result forcasted [EUR]')
+                
+                # Display the bar chart in Streamlit
+                show_figure(fig)
+                
+            with col4:
+                # Create a pie chart
+                df_plot = view_top(filter_df, "result", "4casted_negative_pie")
+                fig, ax = plt.subplots()
+                ax.set_title('Master projects | NEGATIVE Result forcasted')
+                ax.pie(-df_plot['PR_4casted'], labels=df_plot['WO'], autopct='%1.f%%', startangle=90)
+                ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+                
+                # Display the pie chart in Streamlit
+                show_figure(fig)
+                
+        
+            # =============================================================
+            st.subheader("Statistics...")
+            
+            table = view_stat_pm(filter_df, "result")
+            
+            if table.shape[0] > 0:
+                texts = ["PM"] + list(table.columns)
+                cols = st.columns([2, 1, 1.5, 1.5, 1.5, 1.5])
+                for j in range(len(texts)):
+                    with cols[j]:
+                        st.markdown(f"<div style='font-size:20px;font-weight:bold;'><strong>{texts[j]}</strong></div>", unsafe_allow_html=True)
+                                                                
+                for pm, row in table.iterrows():
+                    initials = pm # ''.join([word[0] for word in pm.split()[:-1]]) + '. ' + pm.split()[-1]
+                    stat = [initials, int(row.iloc[0])] + ["{:,.0f}".format(x) for x in row.iloc[1:]]
+                                            
+                    cols = st.columns([2, 1, 1.5, 1.5, 1.5, 1.5])
+                    for j in range(len(stat)): 
+                        with cols[j]:
+                            st.markdown(f"<div style='font-size:16px;'><strong>{stat[j]}</strong></div>", unsafe_allow_html=True)
+        
+        
+        
+    @st.fragment
+    @timed_tab("trend")
+    def tab_trend(self):
+        rates = st.session_state.rates
+        
+        if len(rates) == 0:
+            st.write('Need to load data first...')
+        else:
+            weeks = sorted(self.data_file)
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                first, last = st.select_slider('Weeks', weeks, 
+                                               value=(weeks[max(0, len(weeks) - TREND_WEEKS)], weeks[-1]),
+                                               key='trend_weeks')
+            with col2:
+                level = st.selectbox('Trend per', ["PM_MP", "Entity", "MP"], key='trend_level')
+                
+            # The weeks are only loaded on request: every rerun runs this tab
+            selected = tuple(week for week in weeks if first <= week <= last)
+            if not st.toggle(f'Load the trend of {len(selected)} weeks', key='trend_load'):
+                return
+            
+            with st.spinner(f'Loading {len(selected)} weeks...'):
+                trend, failures = load_trend(selected, tuple(sorted(rates.items())))
+            show_trend_failures(failures, selected, tuple(sorted(rates.items())))
+                
+            if trend.shape[0] == 0:
+                st.write('No data for the selected weeks...')
+                return
+            
+            # =============================================================
+            st.subheader("Trend | Master projects")
+            
+            # Totals are taken on master projects to avoid double counting
+            key = "WO" if level == "MP" else level
+            data = trend[trend["Type"] == "MP"].reset_index()
+            table = data.groupby(["Week", key])[TREND_MEASURES].sum()
+            
+            latest = table.xs(table.index.get_level_values("Week").max(), level="Week")
+            default = latest[TREND_MEASURES[0]].abs().nlargest(10).index.tolist()
+            chosen = st.multiselect(f'{level} to show', sorted(table.index.get_level_values(key).unique()), 
+                                    default=default, key='trend_items')
+            
+            cols = st.columns(len(TREND_MEASURES))
+            for measure, col in zip(TREND_MEASURES, cols):
+                with col:
+                    # Create a line chart
+                    pivot = table[measure].unstack(key).reindex(columns=chosen)
+                    fig, ax = plt.subplots()
+                    ax.set_title(f'{level} | {measure}')
+                    for item in chosen:
+                        ax.plot(pivot.index.astype(str), pivot[item], marker='o', label=item)
+                    ax.grid(color='gray', linestyle='dashed')
+                    plt.xticks(rotation=self.incline)
+                    plt.ylabel(f'{measure} [EUR]')
+                    if len(chosen) > 0:
+                        ax.legend(fontsize='small')
+                    
+                    # Display the line chart in Streamlit
+                    show_figure(fig)
+                    
+            # =============================================================
+            st.subheader("Trend | Single MP, PR or WO")
+            
+            wo = st.text_input('MP, PR or WO number', key='trend_wo')
+            if wo:
+                try:
+                    st.dataframe(trend.loc[wo])
+                except KeyError:
+                    st.write(wo + ' is not found in the selected weeks.')
+                    
+                    
+                    
+    @st.fragment
+    @timed_tab("diff")
+    def tab_diff(self):
+        rates = st.session_state.rates
+        
+        if len(rates) == 0:
+            st.write('Need to load data first...')
+        else:
+            weeks = sorted(self.data_file)
+            
+            col1, col2 = st.columns(2)
+            with col1:
+                week_old = st.selectbox('Compare week', weeks, index=max(0, len(weeks) - 2), key='diff_old')
+            with col2:
+                week_new = st.selectbox('with week', weeks, index=len(weeks) - 1, key='diff_new')
+                
+            # Snapshots come from the shared cache; the weeks in between are
+            # only loaded on request, for the first/last seen weeks
+            selected = tuple(week for week in weeks if min(week_old, week_new) <= week <= max(week_old, week_new))
+            seen = st.checkbox(f'First/last seen within the {len(selected)} weeks', key='diff_seen')
+            with st.spinner('Loading 2 weeks...'):
+                frames = {}
+                for week in (week_old, week_new):
+                    frames[week] = []
+                    for entity, rate in sorted(rates.items()):
+                        if entity not in self.catalogue.entities(week):
+                            st.write(week + "_" + entity + ".xlsb does not exit.")
+                            continue
+                        try:
+                            frames[week].append(scale_snapshot(load_snapshot(week, entity), rate))
+                        except Exception:
+                            st.write(week + "_" + entity + ".xlsb does not exit, cannot be accessed or contains no data.")
+                
+            if len(frames[week_old]) == 0 or len(frames[week_new]) == 0:
+                st.write('No data for the selected weeks...')
+                return
+            
+            diff = diff_snapshots(pd.concat(frames[week_old], ignore_index=True), 
+                                  pd.concat(frames[week_new], ignore_index=True))
+            if seen:
+                with st.spinner(f'Loading {len(selected)} weeks...'):
+                    trend, failures = load_trend(selected, tuple(sorted(rates.items())))
+                show_trend_failures(failures, selected, tuple(sorted(rates.items())))
+                diff = diff.join(seen_weeks(trend), on=["Entity", "WO"])
+            
+            # =============================================================
+            st.subheader(f"Changes from {week_old} to {week_new}")
+            if seen:
+                st.caption(f"First/last seen are within the weeks {min(selected)} to {max(selected)} only.")
+            st.caption(f"Changes of {DIFF_TOLERANCE} EUR or less count as unchanged.")
+            
+            counts = diff["Status"].value_counts()
+            cols = st.columns(4)
+            for col, status in zip(cols, ["new", "closed", "changed", "unchanged"]):
+                with col:
+                    st.metric(status.capitalize(), int(counts.get(status, 0)))
+            
+            status = st.multiselect('Show', ["new", "closed", "changed", "unchanged"], 
+                                    default=["new", "closed", "changed"], key='diff_status')
+            types = st.multiselect('Type', ["MP", "PR", "WO"], default=["MP"], key='diff_type')
+            view = diff[diff["Status"].isin(status) & diff["Type"].isin(types)]
+            download_view(view, f"pcb012_diff_{week_old}_{week_new}", (status, types))
+            st.dataframe(view)
+            
+            # =============================================================
+            st.subheader("Statistics...")
+            
+            # Totals are taken on master projects to avoid double counting
+            deltas = [x for x in diff.columns if x.startswith('Delta_')]
+            summary = diff[diff["Type"] == "MP"].groupby(["Entity", "Status"], observed=True)[deltas].sum()
+            st.dataframe(summary.style.format('{:,.0f}'))
+                    
+                    
+                    
+    @st.fragment
+    @timed_tab("all")
+    def tab_all(self):
+        data = st.session_state.source
+        
+        if data.shape[0] == 0:
+            st.write('Need to load data first...')
+        else:
+            download_view(data, "pcb012_all")
+            st.dataframe(data)
+
+
+# =============================================================================
+# 
+# Streaming now
+# 
+# =============================================================================            
+# `streamlit run` executes this file as __main__; importing it (e.g. from the
+# batch report) does not start the web-app
+if __name__ == "__main__":
+    # Copy-on-write: a selection (e.g. the columns of a tab) shares the data
+    # of its frame until one of the two is modified, so the cached snapshots
+    # are shared by the sessions without copies; always on from pandas 3
+    if int(pd.__version__.split(".")[0]) < 3:
+        pd.set_option("mode.copy_on_write", True)
+    # The server runs this file for the first session; the warm-up starts
+    # then, before the page is built, and only once per server process 
+    # (see start_warmup)
+    start_warmup()
+    trial = streaming()
+
+
@@ -0,0 +1,322 @@
+import os
+import json
+import time
+import argparse
+import threading
+
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+import pandas as pd
+
+from pcb012_core import (
+    pa, build_report, compile_filter, rank_index, rank_top, 
+    get_github_catalogue, parse_data_file, availability_matrix,
+    register_dataset, memory_report, DEFAULT_RATES, AGEING_LEVELS, TABS, INFO_COLUMNS,
+)
+from pcb012_batch import load_week
+
+
+
+# =============================================================================
+#
+# Local HTTP API of pcb012: serves the statistics of the web-app to other
+# dashboards, as JSON or Arrow IPC, without Streamlit
+#
+# A week is loaded and aggregated once, then shared by every client; the
+# serialised responses are cached as well
+#
+# Example:
+#   python pcb012_api.py --data-dir data --port 8502
+#   curl "http://127.0.0.1:8502/kpi/entity?week=2451"
+#   curl "http://127.0.0.1:8502/stat/pm?week=2451&tab=cnc&format=arrow" -o pm.arrow
+#   curl "http://127.0.0.1:8502/top?week=2451&tab=cnc&measure=budget&n=5"
+#   curl "http://127.0.0.1:8502/hierarchy?week=2451&wo=VN1952"
+#
+# Endpoints (all take week=, entities=VN,NL,... and rate=NL=26600):
+#   /weeks          weeks available
+#   /catalogue      availability matrix: a row per week, True per entity
+#                   with a snapshot
+#   /kpi/entity     high-level statistics per entity (info tab)
+#   /kpi/customer   exposure per customer, across entities
+#   /kpi/ageing     outstanding invoices per age bucket (by=entity|pm|customer)
+#   /stat/pm        statistics per PM of a tab (tab=cnc|pr|wo|result)
+#   /top            top-N of a tab (tab=, measure= one of its charts, n=)
+#   /hierarchy      a master project, project or work order and the rows
+#                   under it (wo=)
+#   /memory         memory report of the API process
+#
+# =============================================================================
+
+# Weeks (with their report) kept in memory, and responses kept serialised
+API_DATASETS = 8
+API_RESPONSES = 256
+
+# Seconds for which the list of weeks is reused before it is read again
+API_WEEKS_TTL = 300
+
+ARROW_MIME = "application/vnd.apache.arrow.stream"
+
+TABLE_ENDPOINTS = ["/kpi/entity", "/kpi/customer", "/kpi/ageing", "/stat/pm", "/top", "/hierarchy"]
+
+
+
+# class for a request that cannot be answered, with its HTTP status
+class api_error(Exception):
+
+    def __init__(self, status : int, message : str):
+        super().__init__(message)
+        self.status = status
+
+
+
+# class to hold the loaded weeks and the serialised responses, shared by
+# all the threads of the server; both are dropped least recently used first
+class api_cache:
+
+    def __init__(self, data_dir : str = None):
+        self.data_dir = data_dir
+        self.lock = threading.Lock()
+        self.datasets = {}
+        self.responses = {}
+        self.loading = {}
+        self.listed = (0.0, set())
+
+
+
+    def catalogue(self) -> set:
+        # The (week, entity) of the snapshots; the GitHub catalogue keeps its
+        # own time to live
+        if self.data_dir is None:
+            catalogue = get_github_catalogue('chitn', 'trial', 'main')
+            catalogue.refresh()
+            return set(catalogue.files)
+        
+        if time.time() - self.listed[0] > API_WEEKS_TTL:
+            files = {parse_data_file(x) for x in os.listdir(self.data_dir)} - {None}
+            self.listed = (time.time(), files)
+        return self.listed[1]
+
+
+
+    def weeks(self) -> list:
+        return sorted({week for week, _ in self.catalogue()})
+
+
+
+    def dataset(self, week : str, entities : tuple, rates : tuple) -> dict:
+
+        # =====================================================================
+        # This function returns the data and the report of a week, loading
+        # them once; concurrent requests for the same week wait for the
+        # first one instead of loading it again
+        # =====================================================================
+
+        key = (week, entities, rates)
+        with self.lock:
+            if key in self.datasets:
+                self.datasets[key] = self.datasets.pop(key)
+                return self.datasets[key]
+            loading = self.loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self.lock:
+                if key in self.datasets:
+                    return self.datasets[key]
+
+            try:
+                data = load_week(week, list(entities), dict(rates), self.data_dir)
+                if data.shape[0] == 0:
+                    raise api_error(404, "no data for week " + week)
+                value = {"data": data, "report": build_report(data), "ranks": rank_index(data)}
+                register_dataset("api", f"{week} {','.join(entities)}", data)
+                
+                with self.lock:
+                    self.datasets[key] = value
+                    while len(self.datasets) > API_DATASETS:
+                        del self.datasets[next(iter(self.datasets))]
+            finally:
+                with self.lock:
+                    self.loading.pop(key, None)
+        return value
+
+
+
+    def response(self, key, compute):
+        with self.lock:
+            if key in self.responses:
+                self.responses[key] = self.responses.pop(key)
+                return self.responses[key]
+
+        value = compute()
+
+        with self.lock:
+            self.responses[key] = value
+            while len(self.responses) > API_RESPONSES:
+                del self.responses[next(iter(self.responses))]
+        return value
+
+
+
+# function to serialise a table as JSON records or as an Arrow IPC stream
+def table_bytes(df : pd.DataFrame, fmt : str) -> tuple:
+    # A named index (e.g. Entity or PM) is a column of the table, row 
+    # numbers are not
+    df = df.reset_index(drop=df.index.name is None)
+    if fmt == "arrow":
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), ARROW_MIME
+    return df.to_json(orient="records", date_format="iso").encode("utf-8"), "application/json"
+
+
+
+# function to read the parameters of a request
+# Returns the week, the entities and the rates, as keys of the cache
+def dataset_query(cache : api_cache, query : dict) -> tuple:
+    week = query.get("week", [None])[0]
+    if week is None:
+        weeks = cache.weeks()
+        if len(weeks) == 0:
+            raise api_error(404, "no weeks available")
+        week = weeks[-1]
+
+    entities = query.get("entities", [",".join(DEFAULT_RATES)])[0].split(",")
+    unknown = [x for x in entities if x not in DEFAULT_RATES]
+    if unknown:
+        raise api_error(400, "unknown entities " + ",".join(unknown))
+
+    rates = dict(DEFAULT_RATES)
+    for item in query.get("rate", []):
+        try:
+            entity, rate = item.split("=")
+            rates[entity] = float(rate)
+        except ValueError:
+            raise api_error(400, "rate must be ENTITY=RATE, not " + item)
+
+    return week, tuple(entities), tuple(sorted(rates.items()))
+
+
+
+# function to answer a request for a table of the week of `dataset_key`
+def table_endpoint(cache : api_cache, dataset_key : tuple, path : str, query : dict) -> pd.DataFrame:
+    dataset = cache.dataset(*dataset_key)
+    report = dataset["report"]
+
+    if path == "/kpi/entity":
+        return report["info_entity_stat"]
+
+    if path == "/kpi/customer":
+        return report["info_customer_stat"]
+
+    if path == "/kpi/ageing":
+        level = query.get("by", ["entity"])[0]
+        if level not in AGEING_LEVELS:
+            raise api_error(400, "by must be one of " + ", ".join(AGEING_LEVELS))
+        return report[f"info_ageing_{level}"]
+
+    tab = query.get("tab", [None])[0]
+    if path in ("/stat/pm", "/top") and tab not in TABS:
+        raise api_error(400, "tab must be one of " + ", ".join(TABS))
+
+    if path == "/stat/pm":
+        return report[f"{tab}_pm_stat"]
+
+    if path == "/top":
+        measure = query.get("measure", [None])[0]
+        if measure not in TABS[tab]["tops"]:
+            raise api_error(400, "measure must be one of " + ", ".join(TABS[tab]["tops"]))
+        if "n" not in query:
+            return report[f"{tab}_top_{measure}"]
+        if not query["n"][0].isdigit():
+            raise api_error(400, "n must be a number")
+        data = dataset["data"]
+        view = data.loc[compile_filter(data, [("Type", "isin", [TABS[tab]["type"]])]), TABS[tab]["columns"]]
+        column, _, smallest, conditions = TABS[tab]["tops"][measure]
+        return rank_top(dataset["ranks"], data, view, column, int(query["n"][0]), smallest, conditions)
+
+    if path == "/hierarchy":
+        wo = query.get("wo", [""])[0]
+        if len(wo) == 0:
+            raise api_error(400, "wo is missing")
+        data = dataset["data"]
+        rows = data["WO"].astype(str).str.startswith(wo).to_numpy()
+        return data.loc[rows, INFO_COLUMNS].sort_values(by="WO")
+
+
+
+# class to handle the requests of the API, one thread per request
+class api_handler(BaseHTTPRequestHandler):
+
+    cache = None
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        fmt = query.get("format", ["json"])[0]
+        if fmt == "json" and ARROW_MIME in self.headers.get("Accept", ""):
+            fmt = "arrow"
+
+        try:
+            if fmt not in ("json", "arrow"):
+                raise api_error(400, "format must be json or arrow")
+
+            if url.path == "/weeks":
+                body, mime = json.dumps(self.cache.weeks()).encode("utf-8"), "application/json"
+            elif url.path == "/catalogue":
+                body, mime = table_bytes(availability_matrix(self.cache.catalogue()), fmt)
+            elif url.path == "/memory":
+                body, mime = json.dumps(memory_report(), default=str).encode("utf-8"), "application/json"
+            elif url.path not in TABLE_ENDPOINTS:
+                raise api_error(404, "no endpoint " + url.path)
+            else:
+                # The key holds the week the request resolves to, so that a
+                # request without a week follows the newest one
+                dataset_key = dataset_query(self.cache, query)
+                params = tuple(sorted((k, tuple(v)) for k, v in query.items() 
+                                      if k not in ("format", "week", "entities", "rate")))
+                key = (url.path, dataset_key, params, fmt)
+                body, mime = self.cache.response(
+                    key, lambda: table_bytes(table_endpoint(self.cache, dataset_key, url.path, query), fmt))
+            self.reply(200, body, mime)
+
+        except api_error as e:
+            self.reply(e.status, json.dumps({"error": str(e)}).encode("utf-8"), "application/json")
+        except Exception as e:
+            print('Request', self.path, 'failed:', repr(e))
+            self.reply(500, json.dumps({"error": repr(e)}).encode("utf-8"), "application/json")
+
+
+
+    def reply(self, status : int, body : bytes, mime : str):
+        self.send_response(status)
+        self.send_header("Content-Type", mime)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local HTTP API of pcb012")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="address to listen on (default: local only)")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--data-dir", default=None,
+                        help="folder with the pcb012a_<week>_<entity>.xlsb files (default: GitHub)")
+    args = parser.parse_args()
+
+    api_handler.cache = api_cache(args.data_dir)
+    server = ThreadingHTTPServer((args.host, args.port), api_handler)
+    print('Serving pcb012 on http://{}:{}'.format(args.host, args.port))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import os
+import argparse
+
+import pandas as pd
+
+from pcb012_core import xlsb_file, build_report, export_writer, DEFAULT_RATES, EXPORT_FORMATS
+
+
+
+# =============================================================================
+# 
+# Headless report of pcb012: computes the statistics and top-N tables of 
+# every tab of the web-app, without Streamlit, and writes them to files
+# 
+# Example:
+#   python pcb012_batch.py --weeks 2451 2452 --data-dir data --format parquet csv
+#   python pcb012_batch.py --weeks 2451 2452 --data-dir data --export xlsx
+# 
+# =============================================================================
+
+# function to load all entities of one week into one dataframe (in EUR)
+# Files are read from `data_dir` when given, otherwise from GitHub
+def load_week(week : str, entities : list, rates : dict, data_dir : str = None) -> pd.DataFrame:
+    frames = []
+    for entity in entities:
+        if data_dir:
+            name = os.path.join(data_dir, "pcb012a_" + week + "_" + entity + ".xlsb")
+            if not os.path.exists(name):
+                print(name, 'does not exit.')
+                continue
+        else:
+            name = week + "_" + entity + ".xlsb"
+            
+        try:
+            new = xlsb_file(name, entity, rates[entity] / rates["NL"])
+            frames.append(new.data)
+        except Exception as error:
+            print(name, 'does not exit, cannot be accessed or contains no data:', error)
+            
+    if len(frames) == 0:
+        return pd.DataFrame()
+    
+    return pd.concat(frames, ignore_index = True, sort = False)
+
+
+
+# function to write one table in every requested format
+def write_table(df : pd.DataFrame, path : str, formats : list):
+    for fmt in formats:
+        if fmt == "parquet":
+            df.to_parquet(path + ".parquet")
+        elif fmt == "csv":
+            df.to_csv(path + ".csv")
+        elif fmt == "json":
+            df.reset_index().to_json(path + ".json", orient="records", date_format="iso")
+        
+        
+        
+def main():
+    parser = argparse.ArgumentParser(description="Headless report of pcb012")
+    parser.add_argument("--weeks", nargs="+", required=True, 
+                        help="weeks to report, e.g. 2451 2452")
+    parser.add_argument("--entities", nargs="+", default=list(DEFAULT_RATES),
+                        help="entities to report (default: all)")
+    parser.add_argument("--rate", nargs="*", default=[], metavar="ENTITY=RATE",
+                        help="exchange rate to VND, e.g. NL=26600 (amounts are reported in EUR)")
+    parser.add_argument("--data-dir", default=None,
+                        help="folder with the pcb012a_<week>_<entity>.xlsb files (default: GitHub)")
+    parser.add_argument("--out", default="report", 
+                        help="output folder (default: report)")
+    parser.add_argument("--format", nargs="+", default=["parquet"], choices=["parquet", "csv", "json"],
+                        help="output formats (default: parquet)")
+    parser.add_argument("--export", nargs="*", default=[], choices=EXPORT_FORMATS,
+                        help="also export the whole dataset of all weeks, one sheet per entity in xlsx")
+    args = parser.parse_args()
+    
+    rates = dict(DEFAULT_RATES)
+    for item in args.rate:
+        entity, rate = item.split("=")
+        rates[entity] = float(rate)
+    
+    # The export is written week by week, only one week is held in memory
+    os.makedirs(args.out, exist_ok=True)
+    export_name = "pcb012_" + args.weeks[0] + ("-" + args.weeks[-1] if len(args.weeks) > 1 else "")
+    exports = [export_writer(os.path.join(args.out, export_name + "." + fmt), fmt) for fmt in args.export]
+    
+    for week in args.weeks:
+        data = load_week(week, args.entities, rates, args.data_dir)
+        if data.shape[0] == 0:
+            print('No data for week', week)
+            continue
+        
+        folder = os.path.join(args.out, week)
+        os.makedirs(folder, exist_ok=True)
+        
+        report = build_report(data)
+        for name, table in report.items():
+            write_table(table, os.path.join(folder, name), args.format)
+            
+        print('Week', week, ':', len(report), 'tables written to', folder)
+        
+        data.insert(0, "Week", int(week))
+        for writer in exports:
+            writer.write(data)
+            
+    for writer in exports:
+        writer.close()
+        print(writer.rows, 'rows exported to', writer.path)
+        
+        
+        
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,2312 @@
+import io
+import os
+import re
+import json
+import time
+import hashlib
+import struct
+import pickle
+import zipfile
+import sys
+import socket
+import importlib
+import tracemalloc
+import threading
+import weakref
+import contextlib
+import contextvars
+import multiprocessing
+import concurrent.futures
+
+import numpy as np
+import pandas as pd
+
+from pandas.api.types import (
+    is_categorical_dtype,
+    is_datetime64_any_dtype,
+    is_numeric_dtype,
+)
+
+from datetime import date, datetime, timedelta
+
+
+
+# =============================================================================
+# 
+# Core of pcb012: ingest, cleaning and statistics, without user interface
+# 
+# Importing this module does no I/O and does not import Streamlit; heavy 
+# dependencies are only imported when they are first used
+# 
+# =============================================================================
+
+# class to import a module on the first use of one of its attributes
+class lazy_module:
+    
+    def __init__(self, name : str):
+        self.name = name
+        
+        
+        
+    def __getattr__(self, attr : str):
+        module = importlib.import_module(self.name)
+        return getattr(module, attr)
+    
+    
+    
+requests = lazy_module("requests")
+xlsxwriter = lazy_module("xlsxwriter")
+pa = lazy_module("pyarrow")
+pq = lazy_module("pyarrow.parquet")
+
+
+# =============================================================================
+# 
+# Timing spans
+# 
+# =============================================================================
+
+# class to collect the timing spans of one run (a page rerun, a fragment 
+# rerun or a batch job); spans may be added from several threads
+class span_log:
+    
+    def __init__(self, run : str):
+        self.run = run
+        self.started = time.time()
+        self.origin = time.perf_counter()
+        self.seconds = None
+        self.closed = False
+        self.spans = []
+        self.lock = threading.Lock()
+        # size in bytes once closed, see deep_size
+        self.size = None
+        
+        
+        
+    def add(self, name : str, start : float, seconds : float, info : dict):
+        with self.lock:
+            self.spans.append({"name": name, 
+                               "start": round(start - self.origin, 6), 
+                               "seconds": round(seconds, 6), 
+                               "thread": threading.current_thread().name, 
+                               **info})
+            
+            
+            
+    def close(self):
+        self.closed = True
+        self.seconds = round(time.perf_counter() - self.origin, 6)
+        
+        
+        
+    def to_dict(self) -> dict:
+        return {"run": self.run, 
+                "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)), 
+                "seconds": self.seconds, 
+                "spans": sorted(self.spans, key=lambda x: x["start"])}
+    
+    
+    
+    def to_frame(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.to_dict()["spans"])
+        if len(df) == 0:
+            return pd.DataFrame(columns=["name", "start", "seconds", "thread"])
+        # extra information of the spans (e.g. the file) comes last
+        columns = ["name", "start", "seconds", "thread"]
+        return df[columns + [x for x in df.columns if x not in columns]]
+    
+    
+    
+    def write_json(self, path : str):
+        # One line of JSON per run, appended
+        with open(path, "a") as f:
+            f.write(json.dumps(self.to_dict(), default=str) + "\n")
+    
+    
+    
+# The span log of the current run, None when nothing is recorded
+current_spans = contextvars.ContextVar("pcb012_spans", default=None)
+
+
+
+# function to start recording the spans of a run in the current context
+def start_spans(run : str) -> span_log:
+    log = span_log(run)
+    current_spans.set(log)
+    return log
+
+
+
+# function to time a block as a span of the current run; without an open run
+# it does nothing, so the core can be used without recording anything
+@contextlib.contextmanager
+def span(name : str, **info):
+    log = current_spans.get()
+    if log is None or log.closed:
+        yield
+        return
+    
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        log.add(name, start, time.perf_counter() - start, info)
+
+
+
+# =============================================================================
+# 
+# General supporting functions
+# 
+# =============================================================================
+
+# function to convert Excel-time to normal time
+def excel_float_to_datetime(excel_float):
+    return (datetime(1899, 12, 30) + timedelta(days=excel_float)).date()
+
+
+
+# function to list the money columns (converted with the exchange rate)
+def money_columns(columns) -> list:
+    return [x for x in columns if x.startswith('Contract') or 
+                                  x.startswith('Cost') or 
+                                  x.startswith('PR') or 
+                                  x.startswith('4cast') or 
+                                  x.startswith('Outstanding_inv') or 
+                                  x.startswith('Inv_base') or
+                                  x.startswith('Inv_cost') or 
+                                  x.startswith('WIP') or 
+                                  x.startswith('Workload_firm') ]
+
+
+
+# function to profile the columns of a dataset once, so that the filter UI
+# does not need to scan the data on every rerun
+def profile_dataframe(df : pd.DataFrame) -> dict:
+    profile = {}
+    for col in df.columns:
+        nunique = df[col].nunique()
+        
+        if col in SEARCH_COLUMNS and nunique >= 30:
+            profile[col] = {"kind": "text"}
+            
+        elif is_categorical_dtype(df[col]) or nunique < 30:
+            profile[col] = {"kind": "category",
+                            "values": list(df[col].unique())}
+            
+        elif is_numeric_dtype(df[col]):
+            profile[col] = {"kind": "number",
+                            "min": float(df[col].min()),
+                            "max": float(df[col].max())}
+            
+        elif is_datetime64_any_dtype(df[col]):
+            profile[col] = {"kind": "date",
+                            "min": df[col].min().date(),
+                            "max": df[col].max().date()}
+            
+        else:
+            profile[col] = {"kind": "text"}
+            
+        profile[col]["nunique"] = nunique
+        
+    return profile
+
+
+
+# Columns that get a prebuilt text search index (see search_index)
+SEARCH_COLUMNS = ["Description", "Customer", "PM_MP", "WO"]
+
+
+
+# class to search substrings in a column without scanning it on every rerun
+# The column is dictionary-encoded once; the distinct values are lowercased
+# and indexed by trigram, so a query only checks the candidate values and
+# maps them back to rows through the codes
+class search_index:
+    
+    def __init__(self, series : pd.Series):
+        self.codes, uniques = pd.factorize(series.astype(str))
+        self.texts = [x.lower() for x in uniques]
+        
+        grams = {}
+        for i, text in enumerate(self.texts):
+            for j in range(len(text) - 2):
+                grams.setdefault(text[j:j+3], set()).add(i)
+        self.grams = {key: np.fromiter(value, dtype=np.int64) for key, value in grams.items()}
+        
+        
+        
+    def contains(self, text : str) -> np.ndarray:
+        
+        # =====================================================================
+        # This function returns a row mask for a substring (or regex) query,
+        # ignoring case; a query that is not a valid regex (e.g. "(IC") is
+        # searched as a substring
+        # =====================================================================
+        
+        pattern = None
+        if any(x in ".^$*+?{}[]\\|()" for x in text):
+            try:
+                pattern = re.compile(text, re.IGNORECASE)
+            except re.error:
+                pattern = None
+                
+        # (only the substring search lowercases the query, as the values)
+        query = text.lower()
+        
+        if pattern is not None:
+            # Regex: test the distinct values only
+            match = [i for i, x in enumerate(self.texts) if pattern.search(x)]
+            
+        elif len(query) >= 3:
+            # Substring: intersect the trigram postings, then verify
+            candidates = None
+            for j in range(len(query) - 2):
+                posting = self.grams.get(query[j:j+3])
+                if posting is None:
+                    candidates = np.empty(0, dtype=np.int64)
+                    break
+                candidates = posting if candidates is None else np.intersect1d(candidates, posting)
+            match = [i for i in candidates if query in self.texts[i]]
+            
+        else:
+            match = [i for i, x in enumerate(self.texts) if query in x]
+            
+        hit = np.zeros(len(self.texts) + 1, dtype=bool)
+        hit[match] = True
+        return hit[self.codes]
+
+
+
+# function to check that a query is a valid regex
+def is_regex(text : str) -> bool:
+    try:
+        re.compile(text)
+        return True
+    except re.error:
+        return False
+
+
+
+# function to build the search indexes of a dataset once, at load time
+def build_search_indexes(df : pd.DataFrame) -> dict:
+    return {col: search_index(df[col]) for col in SEARCH_COLUMNS if col in df.columns}
+
+
+
+# function to combine the search indexes of partitions (e.g. one per entity)
+# into the indexes of their concatenation, without indexing the values again
+# The distinct values of each partition are kept apart, with their ids shifted
+def concat_search_indexes(parts : list) -> dict:
+    indexes = {}
+    for col in SEARCH_COLUMNS:
+        if not all(col in part for part in parts):
+            continue
+        
+        offset = 0
+        codes, texts, grams = [], [], {}
+        for part in parts:
+            x = part[col]
+            codes.append(np.where(x.codes >= 0, x.codes + offset, -1))
+            texts += x.texts
+            for key, ids in x.grams.items():
+                grams.setdefault(key, []).append(ids + offset)
+            offset += len(x.texts)
+            
+        index = search_index(pd.Series([], dtype=str))
+        index.codes = np.concatenate(codes) if codes else index.codes
+        index.texts = texts
+        index.grams = {key: np.concatenate(value) for key, value in grams.items()}
+        indexes[col] = index
+        
+    return indexes
+
+
+
+# function to compile a list of filter conditions into a single boolean mask
+# Each condition is a tuple (column, operator, argument) with operator in
+# "isin", "between", ">", "<" or "contains"
+# `search` holds the prebuilt search indexes of df, used for "contains"
+def compile_filter(df : pd.DataFrame, conditions : list, search : dict = None) -> np.ndarray:
+    search = search or {}
+    mask = np.ones(len(df), dtype=bool)
+    
+    for column, operator, argument in conditions:
+        if operator == "isin":
+            mask &= df[column].isin(argument).to_numpy()
+        elif operator == "between":
+            mask &= df[column].between(*argument).to_numpy()
+        elif operator == ">":
+            mask &= (df[column] > argument).to_numpy()
+        elif operator == "<":
+            mask &= (df[column] < argument).to_numpy()
+        elif operator == "contains" and column in search:
+            mask &= search[column].contains(argument)
+        elif operator == "contains":
+            # Ignoring case, as search_index.contains
+            mask &= df[column].astype(str).str.contains(argument, case=False, regex=is_regex(argument)).to_numpy()
+        else:
+            raise ValueError(f"Unknown filter operator {operator}")
+            
+    return mask
+
+
+
+# =============================================================================
+#
+# Catalogue of the snapshots: the (week, entity) of every pcb012a_<week>_
+# <entity>.xlsb file of the data repository, read from its file names once
+# per process and refreshed with a conditional request
+#
+# =============================================================================
+
+DATA_FILE_PATTERN = re.compile(r"pcb012a_(\d{4})[_ ]([A-Z]{2})\.xlsb$")
+
+# Name of a snapshot as asked by the app, with or without its prefix
+SNAPSHOT_PATTERN = re.compile(r"(?:pcb012a_)?(\d{4})[_ ]([A-Z]{2})\.xlsb$")
+
+# Seconds for which the catalogue is used before GitHub is asked again
+CATALOGUE_TTL = float(os.environ.get("PCB012_CATALOGUE_TTL", "300"))
+
+
+
+# function to read the (week, entity) of a snapshot from its file name
+# Returns None for other files
+def parse_data_file(path : str):
+    match = DATA_FILE_PATTERN.search(path)
+    return None if match is None else match.groups()
+
+
+
+# function to build the availability matrix of a set of (week, entity): a
+# row per week (newest first) and a column per entity, True where the 
+# snapshot exists
+def availability_matrix(files) -> pd.DataFrame:
+    weeks = sorted({week for week, _ in files}, reverse=True)
+    return pd.DataFrame({x: [(week, x) in files for week in weeks] for x in DEFAULT_RATES}, 
+                        index=pd.Index(weeks, name="Week", dtype=object))
+
+
+
+# class for the catalogue of the snapshots in a GitHub repository
+# `files` maps (week, entity) to the URL and the SHA of the git blob of
+# the snapshot
+class github_catalogue:
+
+    def __init__(self, repo_owner : str, repo_name : str, branch : str):
+        self.repo_owner = repo_owner
+        self.repo_name = repo_name
+        self.branch = branch
+        self.files = {}
+        self.etag = None
+        self.checked = 0.0
+        self.lock = threading.Lock()
+
+
+
+    def refresh(self, force : bool = False):
+        
+        # =====================================================================
+        # This function reads the git tree again once the catalogue is older
+        # than CATALOGUE_TTL; GitHub answers 304 (and does not count the 
+        # request against its rate limit) when the tree did not change, and 
+        # only changed entries are replaced otherwise
+        # =====================================================================
+        
+        with self.lock:
+            if not force and time.time() - self.checked < CATALOGUE_TTL:
+                return
+            
+            api_url = f'https://api.github.com/repos/{self.repo_owner}/{self.repo_name}/git/trees/{self.branch}?recursive=1'
+            headers = {"If-None-Match": self.etag} if self.etag else {}
+            with span("github.tree", refresh=self.etag is not None):
+                response = requests.get(api_url, headers=headers)
+            self.checked = time.time()
+            
+            if response.status_code == 304:
+                return
+            if response.status_code != 200:
+                print('Failed to fetch data from GitHub.')
+                return
+            
+            files = {}
+            for file in response.json().get('tree', []):
+                key = parse_data_file(file['path']) if file['type'] == 'blob' else None
+                if key is None:
+                    continue
+                old = self.files.get(key)
+                if old is not None and old[1] == file['sha']:
+                    files[key] = old
+                else:
+                    files[key] = (f'https://raw.githubusercontent.com/{self.repo_owner}/{self.repo_name}/{self.branch}/{file["path"]}', file['sha'])
+            self.files = files
+            self.etag = response.headers.get("ETag")
+
+
+
+    def weeks(self) -> list:
+        self.refresh()
+        return sorted({week for week, _ in self.files})
+
+
+
+    def entities(self, week : str) -> list:
+        self.refresh()
+        return [x for x in DEFAULT_RATES if (week, x) in self.files]
+
+
+
+    def source(self, week : str, entity : str) -> tuple:
+        self.refresh()
+        return self.files.get((week, entity), (None, None))
+
+
+
+    def matrix(self) -> pd.DataFrame:
+        self.refresh()
+        return availability_matrix(self.files)
+
+
+
+# The catalogues of this process, one per repository and branch
+catalogues = {}
+catalogues_lock = threading.Lock()
+
+
+
+# function to get the catalogue of a GitHub repository, created once per
+# process
+def get_github_catalogue(repo_owner, repo_name, branch) -> github_catalogue:
+    with catalogues_lock:
+        key = (repo_owner, repo_name, branch)
+        if key not in catalogues:
+            catalogues[key] = github_catalogue(repo_owner, repo_name, branch)
+        return catalogues[key]
+
+
+
+# function to get the URL of a file from a GitHub repository, with the SHA
+# of its git blob
+# Snapshots are looked up in the catalogue, other files in the git tree
+# Returns (None, None) when the file is not found
+def get_github_file(repo_owner, repo_name, branch, file_name):
+    match = SNAPSHOT_PATTERN.search(file_name)
+    if match is not None:
+        url, sha = get_github_catalogue(repo_owner, repo_name, branch).source(*match.groups())
+        if url is None:
+            print('Cannot find the url for ', file_name, '.')
+        return url, sha
+    
+    api_url = f'https://api.github.com/repos/{repo_owner}/{repo_name}/git/trees/{branch}?recursive=1'
+    with span("github.tree", file=file_name):
+        response = requests.get(api_url)
+    if response.status_code == 200:
+        tree = response.json().get('tree', [])
+        for file in tree:
+            if file['type'] == 'blob' and file_name in file['path']:
+                return f'https://raw.githubusercontent.com/{repo_owner}/{repo_name}/{branch}/{file["path"]}', file['sha']
+            
+        print('Cannot find the url for ', file_name, '.')
+        return None, None
+        
+    else:
+        print('Failed to fetch ', file_name, ' from GitHub.')
+        return None, None
+
+
+
+# function to get file URLs from a GitHub repository
+def get_github_file_url(repo_owner, repo_name, branch, file_name):
+    url, _ = get_github_file(repo_owner, repo_name, branch, file_name)
+    return url or []
+
+
+
+# function to list the weeks with a snapshot in a GitHub repository
+def get_github_list_data_file(repo_owner, repo_name, branch):
+    return get_github_catalogue(repo_owner, repo_name, branch).weeks()
+
+
+
+# =============================================================================
+#
+# Download cache: the snapshots downloaded from GitHub are kept on disk, 
+# under the SHA of their git blob, so that a file is downloaded again only
+# once it has changed; files from other URLs are kept under their URL and
+# revalidated with their ETag / Last-Modified
+#
+# =============================================================================
+
+# Folder and size of the cache; PCB012_CACHE_MB=0 downloads every time
+DOWNLOAD_CACHE_DIR = os.environ.get("PCB012_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "pcb012"))
+DOWNLOAD_CACHE_MB = float(os.environ.get("PCB012_CACHE_MB", "512"))
+
+
+
+# function to compute the SHA of the git blob of some bytes, as given by 
+# the git tree of GitHub
+def git_blob_sha(data : bytes) -> str:
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+
+# class for a cache of bytes on disk, one file per entry (and a .json file
+# for its headers); the least recently used entries are removed once the
+# folder is above its size
+class byte_cache:
+
+    def __init__(self, directory : str, limit_mb : float):
+        self.directory = directory
+        self.limit = int(limit_mb * 1024 * 1024)
+        self.lock = threading.Lock()
+
+
+
+    def path(self, key : str) -> str:
+        return os.path.join(self.directory, key)
+
+
+
+    def get(self, key : str) -> bytes:
+        if self.limit <= 0:
+            return None
+        try:
+            with open(self.path(key), "rb") as f:
+                data = f.read()
+            # The time of use is kept as the modification time, since disks
+            # are often mounted without access times
+            os.utime(self.path(key))
+        except OSError:
+            return None
+        return data
+
+
+
+    def meta(self, key : str) -> dict:
+        try:
+            with open(self.path(key) + ".json") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+
+    def put(self, key : str, data : bytes, meta : dict = None):
+        if self.limit <= 0 or len(data) > self.limit:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # Written aside and renamed, so that a reader never sees half a
+            # file, also from another process
+            temp = self.path(key) + f".{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp, "wb") as f:
+                f.write(data)
+            if meta is not None:
+                with open(temp + ".json", "w") as f:
+                    json.dump(meta, f)
+                os.replace(temp + ".json", self.path(key) + ".json")
+            os.replace(temp, self.path(key))
+            self.evict()
+        except OSError as e:
+            print('Cannot keep', key, 'in the download cache:', repr(e))
+
+
+
+    def evict(self):
+        with self.lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.endswith((".json", ".tmp")):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.name))
+                    
+            total = sum(x[1] for x in entries)
+            for _, size, name in sorted(entries):
+                if total <= self.limit:
+                    break
+                for path in (self.path(name), self.path(name) + ".json"):
+                    with contextlib.suppress(OSError):
+                        os.remove(path)
+                total -= size
+
+
+
+download_cache = byte_cache(DOWNLOAD_CACHE_DIR, DOWNLOAD_CACHE_MB)
+
+
+
+# function to download a file through the download cache
+# With the SHA of its git blob, a cached copy is used as it is; otherwise 
+# the cached copy is revalidated with the server, which answers 304 when
+# it has not changed
+def download(url : str, sha : str = None) -> bytes:
+    if sha is not None:
+        key = "blob-" + sha
+        data = download_cache.get(key)
+        if data is not None and git_blob_sha(data) == sha:
+            return data
+        
+        with span("download.fetch", url=url):
+            response = requests.get(url)
+        response.raise_for_status()
+        data = response.content
+        if git_blob_sha(data) == sha:
+            download_cache.put(key, data)
+        else:
+            print('Download of', url, 'does not match its blob', sha, ', not cached.')
+        return data
+    
+    key = "url-" + hashlib.sha256(url.encode("utf-8")).hexdigest()[:32]
+    data = download_cache.get(key)
+    headers = {}
+    if data is not None:
+        meta = download_cache.meta(key)
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    
+    with span("download.fetch", url=url, revalidate=data is not None):
+        response = requests.get(url, headers=headers)
+    if response.status_code == 304 and data is not None:
+        return data
+    response.raise_for_status()
+    
+    data = response.content
+    meta = {"url": url, 
+            "etag": response.headers.get("ETag"), 
+            "last_modified": response.headers.get("Last-Modified")}
+    if meta["etag"] or meta["last_modified"]:
+        download_cache.put(key, data, meta)
+    return data
+
+
+
+# =============================================================================
+# repo_owner = 'chitn'
+# repo_name = 'trial'
+# branch = 'main'
+# file_name = 'pcb012a_2450_VN.xlsb'
+# 
+# file_url = get_github_file_url(repo_owner, repo_name, branch, file_name)
+# print(file_url)
+# =============================================================================
+      
+
+
+# function to check if Streamlit app is running locally or online, 
+# by using os and socket libraries to determine the environment
+# If the IP address of the machine running the app starts with 
+# 127. or 192.168., it is likely running locally. 
+# Otherwise, it is running online.
+def is_running_locally():
+    hostname = socket.gethostname()
+    local_ip = socket.gethostbyname(hostname)
+    print(hostname, ' ', local_ip)
+    return local_ip.startswith('127.') or local_ip.startswith('192.168.')
+
+
+# =============================================================================
+# 
+# Native reader of the Report sheet
+# 
+# =============================================================================
+
+# The sheet is a zip member of BIFF12 records: a varint id, a varint length
+# and the payload. Only the records of the cells are decoded, in one pass 
+# over the bytes, into typed arrays; strings stay codes into the shared 
+# string table. The frame is the one pd.read_excel(engine='pyxlsb') gives
+XLSB_ROW, XLSB_BLANK, XLSB_RK, XLSB_ERROR, XLSB_BOOL, XLSB_FLOAT = 0x00, 0x01, 0x02, 0x03, 0x04, 0x05
+XLSB_STRING, XLSB_FORMULA_STRING, XLSB_FORMULA_FLOAT = 0x07, 0x08, 0x09
+XLSB_FORMULA_BOOL, XLSB_FORMULA_ERROR = 0x0A, 0x0B
+XLSB_SHARED_STRING, XLSB_SHEETDATA, XLSB_SHEETDATA_END, XLSB_SHEET = 0x13, 0x0191, 0x0192, 0x019C
+XLSB_DIMENSION = 0x0194
+
+# Strings read as missing by pd.read_excel (its default na_values)
+XLSB_NA_STRINGS = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", 
+                   "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", "NULL", "NaN", "None", 
+                   "n/a", "nan", "null"}
+
+# Use the native reader; set PCB012_NATIVE_XLSB=0 to always read with pyxlsb
+NATIVE_XLSB = os.environ.get("PCB012_NATIVE_XLSB", "1") != "0"
+
+
+
+# function to walk the records of a BIFF12 part, as (id, start, end) of 
+# each payload
+def xlsb_records(data, pos : int = 0):
+    size = len(data)
+    while pos < size:
+        rid = data[pos]
+        pos += 1
+        if rid & 0x80:
+            rid |= data[pos] << 8
+            pos += 1
+        byte = data[pos]
+        length = byte & 0x7F
+        shift = 7
+        pos += 1
+        while byte & 0x80:
+            byte = data[pos]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            pos += 1
+        yield rid, pos, pos + length
+        pos += length
+        
+        
+        
+# function to read a BIFF12 string (a character count then UTF-16) at pos
+def xlsb_string(data, pos : int) -> str:
+    length = int.from_bytes(data[pos:pos+4], "little")
+    return bytes(data[pos+4:pos+4+2*length]).decode("utf-16-le", errors="replace")
+
+
+
+# function to find the part of a sheet of the workbook by its name
+def xlsb_sheet_part(archive : zipfile.ZipFile, sheet_name : str) -> str:
+    rels = archive.read("xl/_rels/workbook.bin.rels").decode("utf-8")
+    targets = dict(re.findall(r'Id="([^"]+)"[^>]*?Target="([^"]+)"', rels) +
+                   [(i, t) for t, i in re.findall(r'Target="([^"]+)"[^>]*?Id="([^"]+)"', rels)])
+    
+    data = memoryview(archive.read("xl/workbook.bin"))
+    for rid, start, end in xlsb_records(data):
+        if rid == XLSB_SHEET:
+            relid = xlsb_string(data, start + 8)
+            name = xlsb_string(data, start + 12 + 2 * len(relid))
+            if name.lower() == sheet_name.lower():
+                return "xl/" + targets[relid].lstrip("/").removeprefix("xl/")
+    raise KeyError("no sheet " + sheet_name)
+
+
+
+# function to read the shared string table of the workbook
+def xlsb_shared_strings(archive : zipfile.ZipFile) -> list:
+    if "xl/sharedStrings.bin" not in archive.namelist():
+        return []
+    data = memoryview(archive.read("xl/sharedStrings.bin"))
+    return [xlsb_string(data, start + 1) 
+            for rid, start, end in xlsb_records(data) if rid == XLSB_SHARED_STRING]
+
+
+
+# function to decode the cells of a worksheet part in one pass
+# Returns the numbers (NaN elsewhere) and the string codes (-1 elsewhere) as
+# two arrays of the rows and columns of the dimension record of the sheet,
+# with the strings met in formulas appended to `strings`
+# The arrays are allocated once the dimension is read and every cell is 
+# written in place, through typed views of them
+def xlsb_cells(data, strings : list) -> tuple:
+    cell = struct.Struct("<I4x")
+    cell_rk = struct.Struct("<I4xi")
+    cell_float = struct.Struct("<I4xd")
+    cell_code = struct.Struct("<I4xI")
+    row_number = struct.Struct("<I")
+    dimension = struct.Struct("<IIII")
+    rk_double = struct.Struct("<d")
+    
+    extra = {}
+    values = codes = None
+    
+    base = -1
+    width = 0
+    started = False
+    size = len(data)
+    pos = 0
+    while pos < size:
+        # Record header, inlined: the id and the length are varints
+        rid = data[pos]
+        pos += 1
+        if rid & 0x80:
+            rid |= data[pos] << 8
+            pos += 1
+        byte = data[pos]
+        length = byte & 0x7F
+        pos += 1
+        if byte & 0x80:
+            shift = 7
+            while byte & 0x80:
+                byte = data[pos]
+                length |= (byte & 0x7F) << shift
+                shift += 7
+                pos += 1
+        start = pos
+        pos += length
+        
+        if not started:
+            if rid == XLSB_DIMENSION:
+                first_row, last_row, first_col, last_col = dimension.unpack_from(data, start)
+                width = last_col + 1
+                values = np.full((last_row + 1, width), np.nan)
+                codes = np.full((last_row + 1, width), -1, dtype=np.int64)
+                number_at = values.reshape(-1).data.cast("B").cast("d")
+                code_at = codes.reshape(-1).data.cast("B").cast("q")
+            elif rid == XLSB_SHEETDATA:
+                if values is None:
+                    raise ValueError("sheets without a dimension are not read natively")
+                started = True
+        elif rid == XLSB_RK:
+            col, value = cell_rk.unpack_from(data, start)
+            if value & 0x02:
+                number = float(value >> 2)
+            else:
+                number = rk_double.unpack(((value & 0xFFFFFFFC) << 32).to_bytes(8, "little"))[0]
+            if value & 0x01:
+                number /= 100
+            if col >= width:
+                raise ValueError("cells outside the dimension are not read natively")
+            number_at[base + col] = number
+        elif rid == XLSB_STRING:
+            col, code = cell_code.unpack_from(data, start)
+            if col >= width:
+                raise ValueError("cells outside the dimension are not read natively")
+            code_at[base + col] = code
+        elif rid == XLSB_FLOAT or rid == XLSB_FORMULA_FLOAT:
+            col, number = cell_float.unpack_from(data, start)
+            if col >= width:
+                raise ValueError("cells outside the dimension are not read natively")
+            number_at[base + col] = number
+        elif rid == XLSB_ROW:
+            row = row_number.unpack_from(data, start)[0]
+            if row > last_row:
+                raise ValueError("cells outside the dimension are not read natively")
+            base = row * width
+        elif rid == XLSB_BLANK:
+            pass
+        elif rid == XLSB_FORMULA_STRING or rid == XLSB_ERROR or rid == XLSB_FORMULA_ERROR:
+            col, = cell.unpack_from(data, start)
+            if rid == XLSB_FORMULA_STRING:
+                text = xlsb_string(data, start + 8)
+            else:
+                text = hex(data[start + 8])
+            if col >= width:
+                raise ValueError("cells outside the dimension are not read natively")
+            code_at[base + col] = extra.setdefault(text, len(strings) + len(extra))
+        elif rid == XLSB_BOOL or rid == XLSB_FORMULA_BOOL:
+            # pyxlsb gives Python booleans, that make the column an object one
+            raise ValueError("boolean cells are not read natively")
+        elif rid == XLSB_SHEETDATA_END:
+            break
+        
+    if values is None:
+        raise ValueError("sheets without a dimension are not read natively")
+    if ((codes >= 0) & ~np.isnan(values)).any():
+        raise ValueError("cells written twice are not read natively")
+    strings.extend(extra)
+    return values, codes
+
+
+
+# function to turn the numbers and the string codes of a column into the
+# column pd.read_excel infers: integers when every cell is a whole number, 
+# floats when numbers only, strings when strings only, objects otherwise
+def xlsb_column(values : np.ndarray, codes : np.ndarray, table : np.ndarray):
+    is_number = ~np.isnan(values)
+    is_string = codes >= 0
+    
+    if not is_string.any():
+        if is_number.all() and len(values) > 0 and (values == np.floor(values)).all():
+            return values.astype(np.int64)
+        return values
+    
+    column = np.full(len(values), np.nan, dtype=object)
+    column[is_string] = table[codes[is_string]]
+    if not is_number.any():
+        return column
+    
+    whole = is_number & (values == np.floor(values))
+    column[whole] = [int(x) for x in values[whole]]
+    column[is_number & ~whole] = values[is_number & ~whole].tolist()
+    return column
+
+
+
+# function to read a sheet of an xlsb workbook (a path or a file object)
+# into the frame pd.read_excel(..., engine='pyxlsb', sheet_name=...) gives
+def read_xlsb_sheet(file, sheet_name : str = "Report") -> pd.DataFrame:
+    with zipfile.ZipFile(file) as archive:
+        part = xlsb_sheet_part(archive, sheet_name)
+        strings = xlsb_shared_strings(archive)
+        data = archive.read(part)
+        
+    values, codes = xlsb_cells(memoryview(data), strings)
+    
+    # Empty strings are empty cells; the sheet ends at its last filled cell
+    table = np.array(strings, dtype=object)
+    empty = np.array([x == "" for x in table] + [True], dtype=bool)
+    codes[empty[codes]] = -1
+    filled = ~np.isnan(values) | (codes >= 0)
+    rows, cols = np.flatnonzero(filled.any(axis=1)), np.flatnonzero(filled.any(axis=0))
+    if len(rows) == 0:
+        return pd.DataFrame()
+    n_rows, n_cols = rows[-1] + 1, cols[-1] + 1
+    values, codes = values[:n_rows, :n_cols], codes[:n_rows, :n_cols]
+    
+    # The first row is the header, as in pd.read_excel
+    names, seen = [], {}
+    for j in range(n_cols):
+        if codes[0, j] >= 0:
+            name = table[codes[0, j]]
+        elif not np.isnan(values[0, j]):
+            value = values[0, j]
+            name = int(value) if value == int(value) else value
+        else:
+            name = "Unnamed: {}".format(j)
+        base, count = name, seen.get(name, 0)
+        while name in names:
+            count += 1
+            name = "{}.{}".format(base, count)
+        seen[base] = count
+        names.append(name)
+        
+    # The strings pd.read_excel reads as missing are dropped from the body
+    missing = np.array([x in XLSB_NA_STRINGS for x in table] + [True], dtype=bool)
+    body = np.where(missing[codes[1:]], -1, codes[1:])
+    columns = {j: xlsb_column(values[1:, j], body[:, j], table) for j in range(n_cols)}
+    df = pd.DataFrame(columns)
+    df.columns = names
+    return df
+
+
+
+# =============================================================================
+# 
+# Processing data from pcb012
+# 
+# =============================================================================
+
+class xlsb_file:
+    
+    def __init__(self, xlsb_file_name, entity, rate):        
+        self.data = pd.DataFrame()
+        self.dict_mp = {}        
+        self.stat = {}
+        self.entity = entity
+        
+        self.input(xlsb_file_name, entity, rate)
+        
+        with span("xlsb.df_2_dict", file=xlsb_file_name):
+            self.df_2_dict()
+        with span("xlsb.statistic", file=xlsb_file_name):
+            self.statistic()
+        
+        # self.to_excel("pcb012_VN")
+        
+                      
+        
+    def input(self, file_name : str, entity : str, rate : float):
+        
+        # =====================================================================
+        # This function reads the xlsb file and does some cleaning works
+        # =====================================================================
+        
+        df = self.read(file_name)
+        with span("xlsb.clean", file=file_name):
+            self.data = self.clean(df, entity, rate)
+        with span("xlsb.ageing", file=file_name):
+            self.data = add_ageing(self.data, report_date(file_name))
+        
+        
+        
+    def read(self, file_name : str) -> pd.DataFrame:
+        
+        # =====================================================================
+        # This function reads the Report sheet of the xlsb file as it is
+        # =====================================================================
+
+        """
+        if is_running_locally():
+            # Read xlsb file - locally
+            print('Running local.') 
+        else:
+            # Read xlsb file - github
+            repo_owner = 'chitn'
+            repo_name = 'trial'
+            branch = 'main'            
+            file_name = get_github_file_url(repo_owner, repo_name, branch, file_name)
+            print('Running online.') 
+        """
+        
+        name = file_name
+        
+        # Local files are read directly, other names are looked up on GitHub
+        # and downloaded first, so that download and parsing are timed apart
+        if not os.path.exists(file_name):
+            repo_owner = 'chitn'
+            repo_name = 'trial'
+            branch = 'main'            
+            url, sha = get_github_file(repo_owner, repo_name, branch, file_name)
+            if url is None:
+                raise FileNotFoundError(name)
+            with span("github.download", file=name):
+                file_name = io.BytesIO(download(url, sha))
+        # st.write(file_name)
+        
+        # The native reader gives the same frame as pyxlsb; any workbook it
+        # does not handle is read again with pyxlsb
+        with span("xlsb.parse", file=name):
+            df = None
+            if NATIVE_XLSB:
+                try:
+                    df = read_xlsb_sheet(file_name, 'Report')
+                except Exception as e:
+                    print('Native reading of ' + name + ' failed, using pyxlsb: ' + repr(e))
+                    if hasattr(file_name, "seek"):
+                        file_name.seek(0)
+            if df is None:
+                df = pd.read_excel(file_name, engine = 'pyxlsb', sheet_name = 'Report')
+        # st.write('Done loading ', file_name)   
+        
+        # Some reports are saved without their trailing empty columns
+        if df.shape[1] < 100:
+            df = df.reindex(columns=list(df.columns) + list(range(df.shape[1], 100)))
+        
+        return df
+        
+        
+        
+    def clean(self, df : pd.DataFrame, entity : str, rate : float) -> pd.DataFrame:
+        
+        # =====================================================================
+        # This function does the cleaning works on a raw Report sheet
+        # =====================================================================
+                
+        # Set name for columns
+        df.columns = ["Type",                  # 0
+                      "WO",                    # 1
+                      "2",                     # 2 WO_Linked
+                      "3",                     # 3 Valuation_type
+                      "4",                     # 4
+                      "PM_MP",                 # 5
+                      "Description",           # 6
+                      "Project_type",          # 7
+                      "8",                     # 8 Won/Lost
+                      "9",                     # 9
+                      "10",                    # 10 ACPE_status
+                      "Project_tier",          # 11
+                      "12",                    # 12 Invoice_type
+                      "13",                    # 13
+                      "14",                    # 14
+                      "Contract_2d_invoiced",  # 15
+                      "16",                    # 16
+                      "17",                    # 17
+                      "18",                    # 18
+                      "19",                    # 19
+                      "20",                    # 20
+                      "21",                    # 21
+                      "Contract_2d_total",     # 22
+                      "Contract_budget",       # 23
+                      "Cost_2d_total",         # 24
+                      "Cost_2d_txt",           # 25
+                      "Cost_2d_subcon",        # 26
+                      "Cost_2d_others",        # 27
+                      "Cost_budget_total",     # 28
+                      "Cost_budget_txt",       # 29
+                      "Cost_budget_subcon",    # 30
+                      "Cost_budget_contin",    # 31
+                      "Cost_budget_others",    # 32
+                      "Cost_4cast_total",      # 33
+                      "Cost_4cast_txt",        # 34
+                      "Cost_4cast_subcon",     # 35
+                      "Cost_4cast_contin",     # 36
+                      "Cost_4cast_others",     # 37
+                      "Date_budget",           # 38
+                      "Date_4cast",            # 39
+                      "Ratio_invoiced %",      # 40
+                      "Ratio_spent %",         # 41
+                      "Ratio_txt %",           # 42
+                      "43",                    # 43
+                      "PR_month",              # 44
+                      "PR_year",               # 45
+                      "PR_2date",              # 46
+                      "PR_budgeted_selling",   # 47
+                      "PR_4casted",            # 48
+                      "PR_4casted_execution",  # 49
+                      "PR_net_year",           # 50
+                      "PR_net_2date",          # 51
+                      "52",                    # 52
+                      "53",                    # 53
+                      "54",                    # 54
+                      "55",                    # 55
+                      "56",                    # 56
+                      "57",                    # 57
+                      "58",                    # 58
+                      "4cast_change_pr",       # 59
+                      "4cast_change_contin",   # 60
+                      "61",                    # 61
+                      "62",                    # 62
+                      "63",                    # 63
+                      "64",                    # 64
+                      "65",                    # 65
+                      "66",                    # 66
+                      "67",                    # 67
+                      "Outstanding_inv",       # 68
+                      "69",                    # 69
+                      "70",                    # 70
+                      "Inv_oldest_unpaid",     # 71
+                      "Inv_most_recent",       # 72
+                      "Inv_base",              # 73
+                      "WIP_gross",             # 74
+                      "Inv_cost",              # 75
+                      "WIP_net",               # 76
+                      "77",                    # 77
+                      "78",                    # 78
+                      "79",                    # 79
+                      "80",                    # 80
+                      "81",                    # 81
+                      "82",                    # 82
+                      "Workload_firm",         # 83
+                      "WO_date_start",         # 84
+                      "WO_date_end",           # 85
+                      "86",                    # 86 Outstanding_com
+                      "Customer",              # 87
+                      "88",                    # 88
+                      "89",                    # 89 Department
+                      "90",                    # 90
+                      "91",                    # 91 PM_project
+                      "92",                    # 92 PM_workoder
+                      "93",                    # 93 ADAG
+                      "94",                    # 94 Project_admin
+                      "95",                    # 95 Project_controller
+                      "96",                    # 96
+                      "97",                    # 97
+                      "98",                    # 98
+                      "99"                     # 99
+                      ]
+        
+        
+        # Delete the first 17 rows of trivial info
+        df = df.iloc[17:]
+        df.reset_index(drop=True, inplace=True)
+        
+        
+        # Delete all blank rows
+        df = df[df["Type"] != "MPZ"]
+           
+                
+        # Delete all columns with name as a number
+        columns = [x for x in df.columns if not x.isdigit()]
+        df = df[columns]
+        
+        
+        # Change format of columns to float & currency
+        columns = money_columns(df.columns)
+        df[columns] = df[columns].astype(float)
+        df[columns] = df[columns] * rate
+        
+        
+        # Change format of columns to float
+        columns = [x for x in df.columns if x.startswith('Ratio')]
+        df[columns] = df[columns].astype(float)
+        df[columns] = df[columns]
+        
+        
+        # Change format of columns to Date
+        columns = [x for x in df.columns if ('Date' in x) or
+                                            ('WO_date' in x) or
+                                            ('Inv_oldest' in x) or
+                                            ('Inv_most' in x) ]
+        # (vectorised equivalent of excel_float_to_datetime, kept as datetime64
+        # so that the filters do not need to convert them again)
+        for col in columns:
+            df[col] = pd.to_datetime(df[col].fillna(1).astype(float), 
+                                     unit='D', origin='1899-12-30').dt.normalize()
+            
+            
+        # Add a column to identify Entity
+        df["Entity"] = entity
+            
+        
+        # Change format of columns to Category
+        columns = ["Type", "WO", "PM_MP", "Project_type", "Project_tier", "Entity"]
+        df[columns] = df[columns].astype("category")
+        
+        
+        return df
+
+
+
+    def to_excel(self, excel_file_name : str): 
+        
+        # =====================================================================
+        # This function prints the whole dataframe into an Excel file
+        # =====================================================================
+        
+        # One sheet named after the entity, see export_writer
+        with export_writer(excel_file_name + ".xlsx", "xlsx") as writer:
+            writer.write(self.data)
+        
+        
+        
+    def df_2_dict(self):
+        
+        # =====================================================================
+        # This function converts a dataframe to a nested dictionary of
+        # Master projects, Projects, Workorders
+        # =====================================================================
+        
+        # Convert each row into a dictionary
+        row_dicts = {}
+        for index, row in self.data.iterrows():
+            row_dicts[row['WO']] = row.to_dict()
+            
+        # Remove the 'WO' key from each dictionary
+        for key in row_dicts:
+            del row_dicts[key]['WO']
+            
+        # Seperate dictionaries of MPs, PRs and WOs
+        dict_pr = {}
+        dict_wo = {}
+        
+        
+        for key, value in row_dicts.items():
+            new_dict = {'main' : value}
+            # Rows without a WO number cannot be placed in the tree
+            if not isinstance(key, str):
+                continue
+            if len(key) == 6:
+                self.dict_mp[key] = new_dict
+            elif len(key) == 10:
+                dict_pr[key] = new_dict
+            elif len(key) == 14:
+                dict_wo[key] = new_dict
+              
+                
+        for key, value in dict_wo.items():
+            for item in dict_pr:
+                if (item in key):
+                    dict_pr[item][key] = value
+                    break 
+                  
+                    
+        for key, value in dict_pr.items():
+            for item in self.dict_mp:
+                if (item in key):
+                    self.dict_mp[item][key] = value
+                    break                           
+
+
+
+    def statistic(self, *args):
+        
+        # =====================================================================
+        # This function does a statistic for an entity
+        # =====================================================================
+        
+        unique_mp = self.data['WO'].apply(lambda x: x if isinstance(x, str) and len(x) == 6  else None).unique() 
+        unique_pr = self.data['WO'].apply(lambda x: x if isinstance(x, str) and len(x) == 10 else None).unique() 
+        unique_wo = self.data['WO'].apply(lambda x: x if isinstance(x, str) and len(x) == 14 else None).unique() 
+        unique_pm = self.data['PM_MP'].unique()     
+                
+        self.stat['mp_list'] = unique_mp.tolist()
+        self.stat['mp_no'] = len(self.stat['mp_list'])
+        
+        self.stat['pr_list'] = unique_pr.tolist()
+        self.stat['pr_no'] = len(self.stat['pr_list'])
+        
+        self.stat['wo_list'] = unique_wo.tolist()
+        self.stat['wo_no'] = len(self.stat['wo_list'])
+        
+        self.stat['pm_list'] = unique_pm.tolist()
+        self.stat['pm_no'] = len(self.stat['pm_list'])
+        
+        Contract_budget = self.data.loc[self.data['Type'] == 'MP', 'Contract_budget'].sum()
+        Contract_2d_invoiced = self.data.loc[self.data['Type'] == 'MP', 'Contract_2d_invoiced'].sum()
+        Contract_2d_total = self.data.loc[self.data['Type'] == 'MP', 'Contract_2d_total'].sum()
+        Outstanding_inv = self.data.loc[self.data['Type'] == 'MP', 'Outstanding_inv'].sum()
+        Workload_firm = self.data.loc[self.data['Type'] == 'MP', 'Workload_firm'].sum()
+        
+        self.stat['Contract_budget'] = Contract_budget
+        self.stat['Contract_2d_invoiced'] = Contract_2d_invoiced
+        self.stat['Contract_2d_total'] = Contract_2d_total
+        self.stat['Outstanding_inv'] = Outstanding_inv
+        self.stat['Workload_firm'] = Workload_firm
+        
+        for ar in args:
+            if ar == 'Print':
+                print('Contract budgetted  {:17,.0f}'.format(Contract_budget))
+                print('Contract invoiced   {:17,.0f}'.format(Contract_2d_invoiced))
+                print('Contract to date    {:17,.0f}'.format(Contract_2d_total))
+                print('Outstanding invoice {:17,.0f}'.format(Outstanding_inv))
+                print('Workload firm       {:17,.0f}'.format(Workload_firm))                    
+     
+        
+ 
+# =============================================================================
+# 
+# Statistics of the tabs (shared by the web-app and the batch report)
+# 
+# =============================================================================
+
+# Number of items in the top-N charts
+TOP = 20
+
+# Default exchange rates to VND; amounts are shown in EUR (rate of "NL")
+DEFAULT_RATES = {"VN": 1.0, "NL": 26600, "UK": 32000, "SG": 18750, "PH": 440, "ML": 5700}
+
+INFO_COLUMNS = ["PM_MP", "Entity", "Type", "WO", "Description", 
+                "Project_type", "Project_tier", "Customer", "WO_date_start", "WO_date_end", 
+                "Contract_budget", "Contract_2d_invoiced",
+                "Outstanding_inv", "Workload_firm"]
+
+# For each tab: the type of rows shown, the columns, the top-N charts as
+# (measure, n, smallest, conditions) and the per-PM statistics as (label, measure)
+TABS = {
+    "cnc": {"type": "MP",
+            "columns": ["PM_MP", "Entity", "WO", "Description", 
+                        "Contract_2d_invoiced", "Contract_2d_total", "Contract_budget", 
+                        "Cost_2d_total", "Cost_budget_total", "Cost_4cast_total", 
+                        "WIP_gross", "WIP_net", 
+                        "Outstanding_inv", "Inv_oldest_unpaid", "Inv_most_recent", "Inv_ageing", "Inv_base", "Inv_cost", 
+                        "Ratio_spent %", "Workload_firm", "Type"],
+            "tops": {"budget":      ("Contract_budget", 10, False, [("Contract_budget", ">", 0)]),
+                     "spent":       ("Ratio_spent %", TOP, False, [("Contract_budget", ">", 0)]),
+                     "workload":    ("Workload_firm", TOP, False, [("Contract_budget", ">", 0)]),
+                     "outstanding": ("Outstanding_inv", TOP, False, [("Contract_budget", ">", 0)])},
+            "stat": [("WIP", "WIP_gross"), 
+                     ("Workload remained", "Workload_firm"), 
+                     ("Contract budget", "Contract_budget"), 
+                     ("Contract invoiced", "Contract_2d_invoiced"), 
+                     ("Cost to-date", "Cost_2d_total"), 
+                     ("Out. invoice", "Outstanding_inv")]},
+    
+    "pr":  {"type": "PR",
+            "columns": ["PM_MP", "Entity", "WO", "Description",  
+                        "Cost_2d_total", "Cost_2d_txt", "Cost_2d_subcon", "Cost_2d_others", 
+                        "Cost_budget_total", "Cost_budget_txt", "Cost_budget_subcon", "Cost_budget_contin", "Cost_budget_others", 
+                        "Cost_4cast_total", "Cost_4cast_txt", "Cost_4cast_subcon", "Cost_4cast_contin", "Cost_4cast_others", 
+                        "4cast_change_pr", "4cast_change_contin", 
+                        "Ratio_invoiced %", "Ratio_spent %", "Ratio_txt %",  
+                        "Date_budget", "Date_4cast", "Type"],
+            "tops": {"budget":      ("Cost_budget_total", TOP, False, [("Cost_budget_total", ">", 0)]),
+                     "cost":        ("Cost_2d_total", TOP, False, [("Cost_2d_total", ">", 0)]),
+                     "contingency": ("Cost_budget_contin", TOP, False, [("Cost_budget_contin", ">", 0)]),
+                     "spent":       ("Ratio_spent %", round(TOP*1.5), False, [("Ratio_spent %", ">", 0), ("Ratio_spent %", "<", 120)])},
+            "stat": [("Cost to-date", "Cost_2d_total"), 
+                     ("Cost budget", "Cost_budget_total"), 
+                     ("Budget cont.", "Cost_budget_contin"), 
+                     ("Budget subcon", "Cost_budget_subcon"), 
+                     ("Cost 4cast", "Cost_4cast_total"), 
+                     ("4cast cont.", "Cost_4cast_contin")]},
+    
+    "wo":  {"type": "WO",
+            "columns": ["PM_MP", "Entity", "WO", "Description",  
+                        "Cost_2d_total", "Cost_2d_txt", "Cost_2d_subcon", "Cost_2d_others", 
+                        "Cost_budget_total", "Cost_budget_txt", "Cost_budget_subcon", "Cost_budget_contin", "Cost_budget_others", 
+                        "Cost_4cast_total", "Cost_4cast_txt", "Cost_4cast_subcon", "Cost_4cast_contin", "Cost_4cast_others", 
+                        "4cast_change_contin", 
+                        "Ratio_invoiced %", "Ratio_spent %", "Ratio_txt %",  
+                        "Date_budget", "Date_4cast", "Type"],
+            "tops": {"budget":      ("Cost_budget_total", TOP, False, [("Cost_budget_total", ">", 0)]),
+                     "cost":        ("Cost_2d_total", TOP, False, [("Cost_2d_total", ">", 0)]),
+                     "contingency": ("Cost_budget_contin", TOP, False, [("Cost_budget_contin", ">", 0)]),
+                     "spent":       ("Ratio_spent %", round(TOP*1.5), False, [("Ratio_spent %", ">", 0), ("Ratio_spent %", "<", 120)])},
+            "stat": [("Cost to-date", "Cost_2d_total"), 
+                     ("Cost budget", "Cost_budget_total"), 
+                     ("Budget cont.", "Cost_budget_contin"), 
+                     ("Budget subcon", "Cost_budget_subcon"), 
+                     ("Cost 4cast", "Cost_4cast_total"), 
+                     ("4cast cont.", "Cost_4cast_contin")]},
+    
+    "result": {"type": "MP",
+               "columns": ["PM_MP", "Entity", "WO", "Description", 
+                           "PR_month", "PR_year", "PR_2date", "PR_net_year", "PR_net_2date", 
+                           "PR_budgeted_selling", 
+                           "PR_4casted", "PR_4casted_execution", "4cast_change_pr", "Type"],
+               "tops": {"month_positive":    ("PR_month", TOP, False, [("PR_month", ">", 0)]),
+                        "2date_positive":    ("PR_net_2date", TOP, False, [("PR_net_2date", ">", 0)]),
+                        "4casted_positive":  ("PR_4casted", TOP, False, [("PR_4casted", ">", 0)]),
+                        "4casted_positive_pie": ("PR_4casted", 10, False, [("PR_4casted", ">", 0)]),
+                        "month_negative":    ("PR_month", TOP, True, [("PR_month", "<", 0)]),
+                        "2date_negative":    ("PR_net_2date", TOP, True, [("PR_net_2date", "<", 0)]),
+                        "4casted_negative":  ("PR_4casted", TOP, True, [("PR_4casted", "<", 0)]),
+                        "4casted_negative_pie": ("PR_4casted", 10, True, [("PR_4casted", "<", 0)])},
+               "stat": [("PR month", "PR_month"), 
+                        ("PR year", "PR_year"), 
+                        ("PR to-date", "PR_2date"), 
+                        ("PR 4cast", "PR_4casted")]},
+    }
+
+
+
+# function to select the top-N rows of a measure, sorted for a bar chart
+def top_n(df : pd.DataFrame, measure : str, n : int, smallest : bool = False, 
+          conditions : list = None) -> pd.DataFrame:
+    df = df[compile_filter(df, conditions or [])]
+    if smallest:
+        df = df.nsmallest(n, measure)
+    else:
+        df = df.nlargest(n, measure)
+    return df.sort_values(by=[measure])
+
+
+
+# Measures of the top-N charts, with their direction (smallest first or not)
+RANKED = sorted({(top[0], top[2]) for spec in TABS.values() for top in spec["tops"].values()})
+
+
+
+# class to select the top-N rows of a measure without sorting on every rerun
+# The rows of a dataset are ordered once per measure and direction, as 
+# nlargest and nsmallest order them (ties in row order, missing values left
+# out); the top-N rows under a mask are then a walk over that order, in 
+# growing chunks, which stops once N rows are found
+class rank_index:
+    
+    def __init__(self, df : pd.DataFrame, ranked : list = RANKED):
+        # The frame the orders are positions of, see rank_top
+        self.source = weakref.ref(df)
+        self.orders = {}
+        self.masks = {}
+        for measure, smallest in ranked:
+            if measure not in df.columns:
+                continue
+            values = df[measure].to_numpy(dtype=float, na_value=np.nan)
+            present = np.flatnonzero(~np.isnan(values))
+            keys = values[present] if smallest else -values[present]
+            self.orders[(measure, smallest)] = present[np.argsort(keys, kind="stable")]
+            
+            
+            
+    def top(self, measure : str, n : int, smallest : bool, mask : np.ndarray) -> np.ndarray:
+        
+        # =====================================================================
+        # This function returns the positions of the top-N rows under a mask
+        # =====================================================================
+        
+        order = self.orders[(measure, smallest)]
+        hits = [np.empty(0, dtype=np.int64)]
+        found, start, chunk = 0, 0, max(4 * n, 64)
+        while found < n and start < len(order):
+            part = order[start:start + chunk]
+            part = part[mask[part]][:n - found]
+            hits.append(part)
+            found += len(part)
+            start += chunk
+            chunk *= 2
+        return np.concatenate(hits)
+    
+    
+    
+    def condition_mask(self, df : pd.DataFrame, conditions : list) -> np.ndarray:
+        # The conditions of the charts are constant, their masks are kept
+        key = repr(conditions)
+        if key not in self.masks:
+            self.masks[key] = compile_filter(df, conditions)
+        return self.masks[key]
+
+
+
+# function to select the top-N rows of a view of `df` (a subset of its rows)
+# with the rank index of `df`; the result is the one of top_n(view, ...)
+# The rank index is only used when it was built from `df` itself and every
+# row of the view is a row of `df`; otherwise top_n is used
+def rank_top(ranks : rank_index, df : pd.DataFrame, view : pd.DataFrame, measure : str, 
+             n : int, smallest : bool = False, conditions : list = None) -> pd.DataFrame:
+    if ranks is None or ranks.source() is not df or (measure, smallest) not in ranks.orders:
+        return top_n(view, measure, n, smallest, conditions)
+    
+    positions = df.index.get_indexer(view.index)
+    if (positions < 0).any():
+        return top_n(view, measure, n, smallest, conditions)
+    
+    mask = np.zeros(len(df), dtype=bool)
+    mask[positions] = True
+    if conditions:
+        mask &= ranks.condition_mask(df, conditions)
+    rows = df.index[ranks.top(measure, n, smallest, mask)]
+    return view.loc[rows].sort_values(by=[measure])
+
+
+
+# function to compute the high-level statistics per entity
+def stat_entity(df : pd.DataFrame) -> pd.DataFrame:
+    entity = df["Entity"]
+    is_mp = df["Type"] == "MP"
+    by_entity = df.groupby(entity, observed=True, sort=False)
+    
+    table = pd.DataFrame({
+        "# PnPs":            is_mp.groupby(entity, observed=True, sort=False).sum(),
+        "# Proposals":       (is_mp & (df["Contract_budget"] < 1)).groupby(entity, observed=True, sort=False).sum(),
+        "# WOs":             (df["Type"] == "WO").groupby(entity, observed=True, sort=False).sum(),
+        "# Cust.":           by_entity["Customer"].nunique(),
+        "Contract budget":   by_entity["Contract_budget"].sum(),
+        "Contract invoiced": by_entity["Contract_2d_invoiced"].sum(),
+        "Workload remained": by_entity["Workload_firm"].sum(),
+        "Outs. invoice":     by_entity["Outstanding_inv"].sum(),
+        })
+    table.index.name = "Entity"
+    
+    return table
+
+
+
+# function to compute the statistics per PM of a tab, `stat` is the list of 
+# (label, measure) of the tab
+def stat_pm(df : pd.DataFrame, stat : list) -> pd.DataFrame:
+    by_pm = df.groupby("PM_MP", observed=True, sort=False, dropna=False)
+    
+    table = by_pm[[measure for label, measure in stat]].sum()
+    table.columns = [label for label, measure in stat]
+    table.insert(0, "# PnPs", by_pm.size())
+    table.index.name = "PM"
+    
+    return table
+
+
+
+# class of the rollup cube of a dataset: the sums of every money column over
+# (Week, Entity, PM_MP, Type, Project_tier), built once when the data is 
+# loaded. Statistics of a view whose filters only select values of these 
+# dimensions are re-aggregated from the cube instead of the raw rows
+class rollup_cube:
+    
+    DIMENSIONS = ["Week", "Entity", "PM_MP", "Type", "Project_tier"]
+    
+    def __init__(self, df : pd.DataFrame = None, week = None):
+        # Without a dataset the cube is empty, see concat_cubes
+        if df is None:
+            return
+        
+        measures = money_columns(df.columns)
+        keys = [df["Week"] if "Week" in df.columns else pd.Series(week, index=df.index, name="Week")] + \
+               [df[x] for x in self.DIMENSIONS[1:]]
+        
+        # (assign builds a new frame, `df` is left as it is without 
+        # copy-on-write too)
+        values = df[measures].assign(Rows=1, 
+                                     Proposals=((df["Type"] == "MP") & (df["Contract_budget"] < 1)).astype(int))
+        groups = values.groupby(keys, observed=True, sort=False, dropna=False)
+        
+        # (cells are in order of appearance of their first row)
+        # Distinct customers do not add up, they are kept per entity 
+        # for the unfiltered statistics
+        self.set_table(groups.sum(), 
+                       df.groupby("Entity", observed=True, sort=False)["Customer"].nunique())
+        
+        
+        
+    def set_table(self, table : pd.DataFrame, customers : pd.Series):
+        self.table = table
+        self.customers = customers
+        self.levels = {x: self.table.index.get_level_values(x) for x in self.DIMENSIONS}
+        self.values = {x: self.table[x].to_numpy(dtype=float) for x in self.table.columns}
+        
+        
+        
+    def covers(self, conditions : list) -> bool:
+        # True when every condition selects values of a dimension
+        return all(column in self.DIMENSIONS and operator == "isin" for column, operator, argument in conditions)
+    
+    
+    
+    def select(self, conditions : list) -> np.ndarray:
+        # Mask of the cells selected by `conditions`
+        mask = np.ones(len(self.table), dtype=bool)
+        for column, operator, argument in conditions:
+            mask &= self.levels[column].isin(argument)
+        return mask
+    
+    
+    
+    def stat_pm(self, conditions : list, stat : list) -> pd.DataFrame:
+        # Same table as stat_pm over the rows selected by `conditions`
+        # The cells are in order of appearance, so are the PMs factorized 
+        # from them, as in the groupby of stat_pm
+        mask = self.select(conditions)
+        codes, pms = pd.factorize(self.levels["PM_MP"][mask], use_na_sentinel=False)
+        
+        columns = {"# PnPs": np.bincount(codes, weights=self.values["Rows"][mask], minlength=len(pms))}
+        for label, measure in stat:
+            columns[label] = np.bincount(codes, weights=self.values[measure][mask], minlength=len(pms))
+        
+        table = pd.DataFrame(columns, index=pd.Index(pms, name="PM"))
+        table["# PnPs"] = table["# PnPs"].astype(int)
+        
+        return table
+    
+    
+    
+    def stat_entity(self) -> pd.DataFrame:
+        # Same table as stat_entity over the whole dataset
+        codes, entities = pd.factorize(self.levels["Entity"])
+        types = self.levels["Type"]
+        total = lambda x: np.bincount(codes, weights=x, minlength=len(entities))
+        
+        table = pd.DataFrame({
+            "# PnPs":            total(np.where(types == "MP", self.values["Rows"], 0)).astype(int),
+            "# Proposals":       total(self.values["Proposals"]).astype(int),
+            "# WOs":             total(np.where(types == "WO", self.values["Rows"], 0)).astype(int),
+            "# Cust.":           self.customers.reindex(entities).to_numpy(),
+            "Contract budget":   total(self.values["Contract_budget"]),
+            "Contract invoiced": total(self.values["Contract_2d_invoiced"]),
+            "Workload remained": total(self.values["Workload_firm"]),
+            "Outs. invoice":     total(self.values["Outstanding_inv"]),
+            }, index=pd.Index(entities, name="Entity"))
+        
+        return table
+
+
+
+# function to combine the cubes of partitions that share no cell (e.g. one 
+# per entity) into the cube of their concatenation, in the same order
+def concat_cubes(cubes : list) -> rollup_cube:
+    cube = rollup_cube()
+    cube.set_table(pd.concat([x.table for x in cubes]), 
+                   pd.concat([x.customers for x in cubes]))
+    return cube
+
+
+
+# Measures of the customer exposure view, as (label, measure)
+CUSTOMER_MEASURES = [("Contract budget", "Contract_budget"), 
+                     ("Contract invoiced", "Contract_2d_invoiced"), 
+                     ("Outs. invoice", "Outstanding_inv"), 
+                     ("Workload remained", "Workload_firm")]
+
+
+
+# class of the customer dimension of a dataset: the customers are 
+# dictionary-encoded once at load time, into a table of distinct names and 
+# one code per row (-1 without customer), so that the statistics per 
+# customer are sums over the codes
+class customer_dimension:
+    
+    def __init__(self, df : pd.DataFrame = None):
+        # Without a dataset the dimension is empty, see concat_customers
+        if df is None:
+            return
+        codes, names = pd.factorize(df["Customer"])
+        self.codes = codes
+        self.names = pd.Index(names, name="Customer")
+        
+        
+        
+    def view(self, df : pd.DataFrame, mask : np.ndarray = None) -> pd.DataFrame:
+        
+        # =====================================================================
+        # This function computes the exposure per customer over the master 
+        # projects of `df` (the rows the dimension was built on), or those
+        # of `mask`: their number, entities and amounts, largest budget first
+        # Projects and work orders repeat the amounts of their master 
+        # project, so they are not counted again
+        # =====================================================================
+        
+        rows = (df["Type"] == "MP").to_numpy() & (self.codes >= 0)
+        if mask is not None:
+            rows &= mask
+        codes = self.codes[rows]
+        size = len(self.names)
+        
+        columns = {"# MPs": np.bincount(codes, minlength=size)}
+        
+        entity_codes, entities = pd.factorize(df["Entity"].to_numpy()[rows])
+        pairs = np.unique(codes * max(len(entities), 1) + entity_codes)
+        by_customer = {}
+        for customer, entity in zip(pairs // max(len(entities), 1), pairs % max(len(entities), 1)):
+            by_customer.setdefault(customer, []).append(entities[entity])
+        columns["Entities"] = [", ".join(sorted(by_customer.get(i, []))) for i in range(size)]
+        
+        for label, measure in CUSTOMER_MEASURES:
+            values = df[measure].to_numpy(dtype=float, na_value=0.0)[rows]
+            columns[label] = np.bincount(codes, weights=values, minlength=size)
+            
+        table = pd.DataFrame(columns, index=self.names)
+        table = table[table["# MPs"] > 0]
+        return table.sort_values(by="Contract budget", ascending=False, kind="stable")
+
+
+
+# function to combine the customer dimensions of partitions into the one of
+# their concatenation; a customer of several partitions gets one code
+def concat_customers(parts : list) -> customer_dimension:
+    dimension = customer_dimension()
+    names = pd.Index(np.concatenate([x.names.to_numpy(dtype=object) for x in parts]) if parts else [], 
+                     dtype=object).unique()
+    codes = []
+    for x in parts:
+        # (code -1, no customer, picks the -1 appended to the lookup)
+        lookup = np.append(names.get_indexer(x.names), -1)
+        codes.append(lookup[x.codes])
+    dimension.codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int64)
+    dimension.names = pd.Index(names, name="Customer")
+    return dimension
+
+
+
+# Ageing of the receivables: the outstanding invoices of a master project 
+# are as old as its oldest unpaid invoice, in days at the end of the week of
+# the report
+AGEING_BUCKETS = ["0-30", "31-60", "61-90", ">90"]
+AGEING_EDGES = [31, 61, 91]
+
+# Levels of the ageing summary, by name
+AGEING_LEVELS = {"entity": "Entity", "pm": "PM_MP", "customer": "Customer"}
+
+
+
+# function to find the date of a report from the week in its file name 
+# (e.g. pcb012a_2451_VN.xlsb: Friday of ISO week 51 of 2024), today when the
+# name is not the name of a snapshot (see SNAPSHOT_PATTERN)
+def report_date(file_name : str) -> pd.Timestamp:
+    match = SNAPSHOT_PATTERN.search(os.path.basename(str(file_name)))
+    if match is None:
+        return pd.Timestamp.today().normalize()
+    
+    year, week = 2000 + int(match.group(1)[:2]), int(match.group(1)[2:])
+    # (28 December is always in the last ISO week of its year)
+    weeks = date(year, 12, 28).isocalendar()[1]
+    if not 1 <= week <= weeks:
+        raise ValueError(f"{file_name} has week {week}, {year} has weeks 1 to {weeks}")
+    return pd.Timestamp(date.fromisocalendar(year, week, 5))
+
+
+
+# function to add the age (Inv_age_days) and the ageing bucket (Inv_ageing)
+# of the outstanding invoices of every row, at ingest; rows without an 
+# outstanding amount or an unpaid invoice date have none
+def add_ageing(df : pd.DataFrame, as_of : pd.Timestamp) -> pd.DataFrame:
+    oldest = df["Inv_oldest_unpaid"]
+    age = (as_of - oldest).dt.days.to_numpy(dtype=float, na_value=np.nan)
+    
+    # (missing dates were read as the Excel day 1, in 1899)
+    open_ = (df["Outstanding_inv"].to_numpy(dtype=float, na_value=0.0) > 0) & \
+            (oldest > pd.Timestamp(1900, 1, 1)).to_numpy()
+    age = np.where(open_, np.maximum(age, 0), np.nan)
+    codes = np.where(np.isnan(age), -1, np.digitize(age, AGEING_EDGES))
+    
+    df["Inv_age_days"] = age
+    df["Inv_ageing"] = pd.Categorical.from_codes(codes, categories=AGEING_BUCKETS, ordered=True)
+    return df
+
+
+
+# function to sum up the outstanding invoices per ageing bucket and per 
+# value of `by` (e.g. Entity, PM_MP or Customer), over the master projects
+# (their projects repeat the same amounts), largest total first
+def ageing_summary(df : pd.DataFrame, by : str) -> pd.DataFrame:
+    buckets = df["Inv_ageing"].cat.codes.to_numpy()
+    rows = (df["Type"] == "MP").to_numpy() & (buckets >= 0)
+    groups, names = pd.factorize(df[by].to_numpy()[rows], use_na_sentinel=False)
+    
+    size = len(AGEING_BUCKETS)
+    amounts = np.bincount(groups * size + buckets[rows], 
+                          weights=df["Outstanding_inv"].to_numpy(dtype=float)[rows], 
+                          minlength=len(names) * size).reshape(-1, size)
+    
+    table = pd.DataFrame(amounts, columns=AGEING_BUCKETS, index=pd.Index(names, name=by))
+    table.insert(0, "# MPs", np.bincount(groups, minlength=len(names)))
+    table["Total"] = amounts.sum(axis=1)
+    return table.sort_values(by="Total", ascending=False, kind="stable")
+
+
+
+# function to compute every statistic and top-N table of the tabs at once
+def build_report(df : pd.DataFrame) -> dict:
+    cube = rollup_cube(df)
+    ranks = rank_index(df)
+    report = {"info_entity_stat": cube.stat_entity(), 
+              "info_customer_stat": customer_dimension(df).view(df)}
+    for level, by in AGEING_LEVELS.items():
+        report[f"info_ageing_{level}"] = ageing_summary(df, by)
+    
+    for tab, spec in TABS.items():
+        data = df.loc[compile_filter(df, [("Type", "isin", [spec["type"]])]), spec["columns"]]
+        report[f"{tab}_pm_stat"] = cube.stat_pm([("Type", "isin", [spec["type"]])], spec["stat"])
+        for name, top in spec["tops"].items():
+            report[f"{tab}_top_{name}"] = rank_top(ranks, df, data, *top)
+            
+    return report
+
+
+
+# =============================================================================
+# 
+# Weekly snapshots and multi-week trends
+# 
+# =============================================================================
+
+# Measures followed over the weeks in the trend tab
+TREND_MEASURES = ["PR_net_2date", "Cost_2d_total", "Workload_firm", "Outstanding_inv"]
+TREND_COLUMNS = ["Entity", "WO", "Type", "PM_MP"] + TREND_MEASURES
+
+
+
+# function to convert a snapshot with an exchange rate
+# Returns a new frame sharing the other columns with `df`, which is left as
+# it is (it may be the cached snapshot)
+def scale_snapshot(df : pd.DataFrame, rate : float) -> pd.DataFrame:
+    return df.assign(**{x: df[x] * rate for x in money_columns(df.columns)})
+
+
+
+# Smallest change of a money column, in the currency of the compared 
+# snapshots (EUR in the web-app), for a row to be flagged "changed"; smaller 
+# deltas are rounding
+DIFF_TOLERANCE = 0.5
+
+
+
+# function to compare two snapshots, aligned on (Entity, WO) with one merge
+# Every row is flagged "new", "closed", "changed" (a money column moved by
+# more than `tolerance`) or "unchanged", with the delta (new - old) of every
+# money column
+def diff_snapshots(old : pd.DataFrame, new : pd.DataFrame, 
+                   tolerance : float = DIFF_TOLERANCE) -> pd.DataFrame:
+    keys = ["Entity", "WO"]
+    labels = ["Type", "PM_MP", "Description"]
+    measures = [x for x in money_columns(new.columns) if x in old.columns]
+    
+    def prepare(df):
+        df = df[keys + labels + measures].astype({"Entity": str, "WO": str, "Type": str, "PM_MP": str})
+        return df.drop_duplicates(subset=keys)
+    
+    merged = prepare(old).merge(prepare(new), on=keys, how="outer", 
+                                suffixes=("_old", "_new"), indicator=True)
+    
+    values_old = merged[[x + "_old" for x in measures]].to_numpy(dtype=float, na_value=0.0)
+    values_new = merged[[x + "_new" for x in measures]].to_numpy(dtype=float, na_value=0.0)
+    delta = values_new - values_old
+    
+    side = merged["_merge"].to_numpy()
+    changed = np.abs(delta).max(axis=1, initial=0.0) > tolerance
+    status = np.select([side == "right_only", side == "left_only", changed], 
+                       ["new", "closed", "changed"], default="unchanged")
+    
+    result = merged[keys].assign(**{x: merged[x + "_new"].fillna(merged[x + "_old"]) for x in labels}, 
+                                 Status=pd.Categorical(status, categories=["new", "closed", "changed", "unchanged"]), 
+                                 **{"Delta_" + x: delta[:, i] for i, x in enumerate(measures)})
+    
+    return result
+
+
+
+# function to find the first and last week each (Entity, WO) appears in,
+# among the weeks of `trend` only (not its whole history)
+def seen_weeks(trend : pd.DataFrame) -> pd.DataFrame:
+    weeks = trend.reset_index().groupby(["Entity", "WO"])["Week"].agg(["min", "max"])
+    return weeks.rename(columns={"min": "First_seen_in_range", "max": "Last_seen_in_range"})
+
+
+
+# =============================================================================
+# 
+# Export of datasets
+# 
+# =============================================================================
+
+EXPORT_FORMATS = ["xlsx", "parquet", "csv"]
+
+# Rows of an Excel sheet; an entity with more rows continues on a new sheet
+EXCEL_MAX_ROWS = 1048576
+
+
+
+# class to export a dataset given as a stream of frames (e.g. one per week), 
+# in "xlsx", "parquet" or "csv", to a path or a binary buffer
+# Each frame is written as soon as it is given, so a multi-week export never 
+# holds more than one frame: Excel uses the constant-memory mode of 
+# xlsxwriter (one sheet per entity), Parquet one row group per frame and CSV
+# is appended to. All frames must have the columns of the first one
+class export_writer:
+    
+    def __init__(self, path : str, fmt : str):
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format {fmt}")
+        
+        self.path = path
+        self.fmt = fmt
+        self.columns = None
+        self.rows = 0
+        
+        self.workbook = None
+        self.sheets = {}
+        self.parquet = None
+        
+        
+        
+    def __enter__(self):
+        return self
+    
+    
+    
+    def __exit__(self, *args):
+        self.close()
+        
+        
+        
+    def write(self, df : pd.DataFrame):
+        if self.columns is None:
+            self.columns = list(df.columns)
+        df = df[self.columns]
+        
+        if self.fmt == "xlsx":
+            self.write_excel(df)
+        elif self.fmt == "parquet":
+            self.write_parquet(df)
+        else:
+            df.to_csv(self.path, mode="w" if self.rows == 0 else "a", 
+                      header=self.rows == 0, index=False)
+        self.rows += len(df)
+        
+        
+        
+    def write_parquet(self, df : pd.DataFrame):
+        # Categories differ between frames, they are written as plain text
+        columns = [x for x in df.columns if isinstance(df[x].dtype, pd.CategoricalDtype)]
+        df = df.astype({x: str for x in columns})
+        
+        if self.parquet is None:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            self.parquet = pq.ParquetWriter(self.path, table.schema)
+        else:
+            table = pa.Table.from_pandas(df, schema=self.parquet.schema, preserve_index=False)
+        self.parquet.write_table(table)
+        
+        
+        
+    def excel_sheet(self, name : str):
+        # Returns the sheet of an entity and its next row, with a new sheet 
+        # when the current one is full
+        if name in self.sheets and self.sheets[name][1] < EXCEL_MAX_ROWS:
+            return self.sheets[name]
+        
+        if self.workbook is None:
+            self.workbook = xlsxwriter.Workbook(self.path, {"constant_memory": True})
+            self.formats = {"money": self.workbook.add_format({'num_format': 44}), 
+                            "date": self.workbook.add_format({'num_format': 'yyyy-mm-dd'})}
+        
+        title = name if name not in self.sheets else f"{name} ({len(self.workbook.worksheets()) + 1})"
+        worksheet = self.workbook.add_worksheet(title[:31])
+        
+        # Column formats apply to every cell written without a format
+        money = money_columns(self.columns)
+        for i, column in enumerate(self.columns):
+            if column in money:
+                worksheet.set_column(i, i, 14, self.formats["money"])
+            elif 'date' in column.lower() or column.startswith('Inv_oldest') or column.startswith('Inv_most'):
+                worksheet.set_column(i, i, 11, self.formats["date"])
+        worksheet.write_row(0, 0, self.columns)
+        worksheet.freeze_panes(1, 0)
+        
+        self.sheets[name] = [worksheet, 1]
+        return self.sheets[name]
+        
+        
+        
+    def write_excel(self, df : pd.DataFrame):
+        # In constant-memory mode a row is flushed to disk once the next row
+        # of the sheet is started, so rows are written in order per sheet
+        if "Entity" in df.columns:
+            parts = df.groupby("Entity", observed=True, sort=False)
+        else:
+            parts = [("Data", df)]
+            
+        for entity, part in parts:
+            values = part.astype(object)
+            values = values.where(part.notna(), None)
+            for row in values.itertuples(index=False, name=None):
+                sheet = self.excel_sheet(str(entity))
+                sheet[0].write_row(sheet[1], 0, row)
+                sheet[1] += 1
+                
+                
+                
+    def close(self):
+        # An Excel export without any row still gets a workbook, with a header
+        if self.fmt == "xlsx" and self.workbook is None:
+            self.columns = self.columns or []
+            self.excel_sheet("Data")
+            
+        if self.workbook is not None:
+            self.workbook.close()
+        if self.parquet is not None:
+            self.parquet.close()
+        self.workbook = None
+        self.parquet = None
+
+
+
+# function to export a dataset, a frame or an iterable of frames, to a file
+# (a path or a binary buffer)
+def export_dataset(frames, path : str, fmt : str) -> int:
+    if isinstance(frames, pd.DataFrame):
+        frames = [frames]
+    with export_writer(path, fmt) as writer:
+        for df in frames:
+            writer.write(df)
+    return writer.rows
+
+
+
+# Media types of the export formats, e.g. for a download
+EXPORT_MIME = {"xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", 
+               "parquet": "application/vnd.apache.parquet", 
+               "csv": "text/csv"}
+
+# Number of serialised exports kept by export_bytes
+EXPORT_CACHE_SIZE = 16
+
+export_lock = threading.Lock()
+export_cache = {}
+
+
+
+# function to serialise a dataset to the bytes of an export file
+# With a `key` (e.g. the dataset and the filters of a view), the bytes are 
+# kept in a small cache and the least recently used are dropped
+def export_bytes(df : pd.DataFrame, fmt : str, key = None) -> bytes:
+    if key is not None:
+        with export_lock:
+            if (key, fmt) in export_cache:
+                export_cache[(key, fmt)] = export_cache.pop((key, fmt))
+                return export_cache[(key, fmt)]
+    
+    buffer = io.BytesIO()
+    export_dataset(df, buffer, fmt)
+    data = buffer.getvalue()
+    
+    if key is not None:
+        with export_lock:
+            export_cache[(key, fmt)] = data
+            while len(export_cache) > EXPORT_CACHE_SIZE:
+                del export_cache[next(iter(export_cache))]
+                
+    return data
+
+
+
+# =============================================================================
+# 
+# Memory accounting
+# 
+# =============================================================================
+
+# Sessions not seen for this long (in seconds) are dropped from the accounting
+SESSION_TTL = 3600
+
+memory_lock = threading.Lock()
+
+# Sizes of the datasets as they were loaded, by (kind, key)
+dataset_memory = {}
+
+# Sizes of what each session holds, by session id
+session_memory = {}
+
+
+
+# function to measure the memory held by a value, in bytes: dataframes are 
+# measured deeply, containers are walked
+def deep_size(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, search_index):
+        return deep_size(value.codes) + deep_size(value.texts) + deep_size(value.grams)
+    if isinstance(value, customer_dimension):
+        return deep_size(value.codes) + deep_size(value.names)
+    if isinstance(value, rank_index):
+        return deep_size(value.orders) + deep_size(value.masks)
+    if isinstance(value, rollup_cube):
+        return deep_size(value.table) + deep_size(value.values) + deep_size(value.customers)
+    if isinstance(value, span_log):
+        # A closed log does not change any more, it is measured once
+        if not value.closed:
+            return deep_size(value.spans)
+        if value.size is None:
+            value.size = deep_size(value.spans)
+        return value.size
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(deep_size(k) + deep_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(deep_size(x) for x in value)
+    return sys.getsizeof(value)
+
+
+
+# function to record the size of a loaded dataset
+def register_dataset(kind : str, key, df : pd.DataFrame):
+    with memory_lock:
+        dataset_memory[(kind, key)] = {"bytes": deep_size(df), "rows": len(df), "loaded": time.time()}
+
+
+
+# function to record the size of what a session holds, `items` by name
+# Only the given items are measured; the others keep their last size, so 
+# the dataset is measured when it changes rather than on every rerun
+def register_session(session_id : str, items : dict = None):
+    sizes = {name: deep_size(value) for name, value in (items or {}).items()}
+    now = time.time()
+    with memory_lock:
+        last = session_memory.get(session_id, {}).get("items", {})
+        sizes = {**last, **sizes}
+        session_memory[session_id] = {"items": sizes, "bytes": sum(sizes.values()), "updated": now}
+        for key in [k for k, v in session_memory.items() if now - v["updated"] > SESSION_TTL]:
+            del session_memory[key]
+
+
+
+# function to count the matplotlib figures still open and their canvas size;
+# figures that are never closed stay in memory for the life of the process
+def figure_memory() -> dict:
+    if "matplotlib.pyplot" not in sys.modules:
+        return {"open": 0, "bytes": 0}
+    # The figures are read from their managers: plt.figure(number) would make
+    # each one the current figure, which the other sessions draw on
+    from matplotlib._pylab_helpers import Gcf
+    managers = Gcf.get_all_fig_managers()
+    size = 0
+    for manager in managers:
+        fig = manager.canvas.figure
+        width, height = fig.get_size_inches() * fig.dpi
+        size += int(width * height * 4)
+    return {"open": len(managers), "bytes": size}
+
+
+
+# function to read the resident memory of the process, None where unknown
+def process_memory() -> dict:
+    report = {"rss": None, "peak_rss": None}
+    try:
+        with open("/proc/self/statm") as f:
+            report["rss"] = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report["peak_rss"] = peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    return report
+
+
+
+# function to start tracing the allocations, with `frames` frames per trace
+# Tracing slows Python down, so it is only started on request
+def start_tracing(frames : int = 1):
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+
+# function to report the memory of the process, sessions, datasets and 
+# figures, plus the top allocating source lines when tracing
+def memory_report(top : int = 10) -> dict:
+    with memory_lock:
+        sessions = {k: dict(v) for k, v in session_memory.items()}
+        datasets = {f"{kind} {key}": dict(v) for (kind, key), v in dataset_memory.items()}
+    
+    report = {"process": process_memory(), 
+              "sessions": sessions, 
+              "datasets": datasets, 
+              "figures": figure_memory(), 
+              "tracemalloc": None}
+    
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().statistics("lineno")[:top]
+        report["tracemalloc"] = {"current": current, 
+                                 "peak": peak, 
+                                 "top": [{"line": str(x.traceback), "bytes": x.size, "count": x.count} for x in stats]}
+    
+    return report
+
+
+
+# =============================================================================
+# 
+# Compute service: heavy work in worker processes
+# 
+# =============================================================================
+
+# Only the ingest of a snapshot (ingest_task) and the rendering of a figure
+# to PNG (render_task) run on the workers. The aggregations of the tabs 
+# (stat_pm, the cube, rank_top) and the building of the figures stay in the
+# session: they read the indexes the session holds (search, ranks, cube) and
+# their results are shown by the session; build_report is only used by the 
+# batch report and the API, which run without the pool
+
+# Number of worker processes shared by all sessions; by default one core is
+# left to the server, and PCB012_WORKERS=0 runs everything in its process
+COMPUTE_WORKERS = int(os.environ.get("PCB012_WORKERS", str(max(0, min(4, (os.cpu_count() or 1) - 1)))))
+
+
+
+# function to start the pool of worker processes, None without workers
+# Workers are spawned rather than forked: the server runs many threads, and 
+# a worker only needs this module, not Streamlit
+def start_compute_pool(workers : int = COMPUTE_WORKERS):
+    if workers <= 0:
+        return None
+    return concurrent.futures.ProcessPoolExecutor(max_workers=workers, 
+                                                  mp_context=multiprocessing.get_context("spawn"))
+
+
+
+# function to serialise a frame to bytes for another process; a pickle keeps
+# the dtypes and the index exactly (an Arrow round trip does not, e.g. for
+# empty categories or columns of missing text), and categories stay codes
+def frame_to_bytes(df : pd.DataFrame) -> bytes:
+    return pickle.dumps(df, protocol=5)
+
+
+
+# function to read a frame back from its bytes
+def frame_from_bytes(data : bytes) -> pd.DataFrame:
+    return pickle.loads(data)
+
+
+
+# function to run a task in a worker with a span log of its own
+# Returns the result, the spans and the id of the worker
+def run_task(func, *args) -> tuple:
+    log = start_spans("worker")
+    try:
+        result = func(*args)
+    finally:
+        log.close()
+        current_spans.set(None)
+    return result, log.spans, os.getpid()
+
+
+
+# function to run a task on the pool, or here without a pool; the spans of 
+# the worker are added to the span log of the caller
+def run_compute(pool, func, *args):
+    if pool is None:
+        return func(*args)
+    
+    start = time.perf_counter()
+    result, spans, pid = pool.submit(run_task, func, *args).result()
+    log = current_spans.get()
+    if log is not None:
+        for x in spans:
+            info = {k: v for k, v in x.items() if k not in ("name", "start", "seconds", "thread")}
+            log.add(x["name"], start + x["start"], x["seconds"], {**info, "worker": pid})
+    return result
+
+
+
+# function to read and clean a snapshot, as bytes (task of a worker)
+def ingest_task(file_name : str, entity : str, rate : float) -> bytes:
+    return frame_to_bytes(xlsb_file(file_name, entity, rate).data)
+
+
+
+# function to render a pickled matplotlib figure to PNG bytes, with the 
+# options of st.pyplot (task of a worker)
+def render_task(figure : bytes) -> bytes:
+    plt = importlib.import_module("matplotlib.pyplot")
+    fig = pickle.loads(figure)
+    try:
+        with span("render"):
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format="png", bbox_inches="tight", dpi=200)
+    finally:
+        plt.close(fig)
+    return buffer.getvalue()